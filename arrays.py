@@ -14,7 +14,11 @@
 
 import unittest
 
-import array
+import numpy
+
+
+# Room for this many positions at least, so tiny arrays don't regrow often.
+_MIN_SLOTS = 16
 
 
 # Impl note: Make this one a proper collections.abc.Sequence subclass if it
@@ -24,27 +28,94 @@ class FastPosArray(object):
 
   The idea here is improve cache locality by putting 'positions'
   (i.e. coordinates of things) close to each other, since these
-  positions are commonly updated together."""
+  positions are commonly updated together.
+
+  The positions live in one preallocated float32 buffer, oldest first.
+  They fill a window of it that starts at _head: dropping the oldest
+  positions just moves _head, and the window only slides back to the
+  start of the buffer when it runs into the end."""
 
-  def __init__(self):
-    self._positions = array.array('f')
+  def __init__(self, capacity=0):
+    # Twice the room, so the window slides back at most once per capacity
+    # positions added.
+    self._buffer = numpy.empty((max(2 * capacity, _MIN_SLOTS), 2),
+                               dtype=numpy.float32)
+    self._head = 0
+    self._count = 0
 
   @property
   def all_positions(self):
-    return ((self._positions[i], self._positions[i + 1])
-            for i in range(0, len(self._positions), 2))
+    return (tuple(position) for position in self.xy_view().tolist())
 
   def num_positions(self):
-    return int(len(self._positions) / 2)
+    return self._count
 
   def append(self, x, y):
-    self._positions.append(x)
-    self._positions.append(y)
+    self._make_room(1)
+    self._buffer[self._head + self._count] = (x, y)
+    self._count += 1
+
+  def extend_xy(self, xs, ys):
+    """Appends many positions at once.
+
+    xs and ys are equally long sequences of coordinates: numpy arrays,
+    lists or anything exporting a buffer of numbers, like array.array."""
+    xs = numpy.asarray(xs)
+    ys = numpy.asarray(ys)
+    if xs.shape != ys.shape or xs.ndim != 1:
+      raise ValueError('extend_xy needs two equally long 1-d sequences')
+    self._make_room(len(xs))
+    end = self._head + self._count
+    self._buffer[end:end + len(xs), 0] = xs
+    self._buffer[end:end + len(xs), 1] = ys
+    self._count += len(xs)
+
+  def as_memoryview(self):
+    """Exports the positions without copying them.
+
+    The memoryview is flat, with format 'f': x0, y0, x1, y1 and so on.
+    Like xy_view(), it doesn't follow the array when positions are added
+    or removed."""
+    return memoryview(self.xy_view().reshape(-1))
+
+  def xy_view(self):
+    """Returns the positions as a (n, 2) numpy array sharing our memory.
+
+    The view doesn't follow the array when positions are added or removed,
+    so get a new one after calling append, keep or delete_first."""
+    return self._buffer[self._head:self._head + self._count]
+
+  def keep(self, mask):
+    """Compacts the array so only positions where mask is True remain.
+
+    The remaining positions stay in order."""
+    kept = self.xy_view()[mask]
+    self._buffer[self._head:self._head + len(kept)] = kept
+    self._count = len(kept)
 
   def write_add(self, index, x, y):
-    self._positions[index * 2] += x
-    self._positions[index * 2 + 1] += y
-    return self._positions[index * 2: index * 2 + 2]
+    position = self._buffer[self._head + index]
+    position += (x, y)
+    return position.tolist()
+
+  def delete_first(self, count):
+    """Deletes the count oldest positions without moving any others."""
+    count = min(count, self._count)
+    self._head += count
+    self._count -= count
+    if not self._count:
+      self._head = 0
 
-  def delete(self, index):
-    del self._positions[index * 2: index * 2 + 2]
+  def _make_room(self, extra):
+    needed = self._count + extra
+    if self._head + needed <= len(self._buffer):
+      return
+    live = self.xy_view()
+    if needed * 2 <= len(self._buffer):
+      # Plenty of room in front of the window; slide it back.
+      self._buffer[:self._count] = live
+    else:
+      grown = numpy.empty((2 * needed, 2), dtype=numpy.float32)
+      grown[:self._count] = live
+      self._buffer = grown
+    self._head = 0
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import array as builtin_array
+import numpy
 import unittest
 
 import arrays
@@ -52,17 +54,69 @@ class FastPosArrayTest(unittest.TestCase):
     self.assertEqual((x2, y2), (4, 5))
     self.assertEqual(next(stored), (4, 5))
 
-  def test_deleting_one(self):
+  def test_keeping_masked_positions_in_order(self):
     array = arrays.FastPosArray()
-    array.append(16, 17)
-    array.append(18, 19)
+    for i in range(5):
+      array.append(i, i + 10)
 
-    array.delete(1)
-    result = array.all_positions
-    self.assertEqual(array.num_positions(), 1)
-    self.assertEqual(next(result), (16, 17))
-    with self.assertRaises(StopIteration):
-      next(result)
+    array.keep(numpy.array([True, False, True, False, True]))
+    self.assertEqual(list(array.all_positions), [(0, 10), (2, 12), (4, 14)])
+
+  def test_extending_from_buffers(self):
+    array = arrays.FastPosArray()
+    array.append(1, 2)
+
+    array.extend_xy(builtin_array.array('f', [3, 5]),
+                    memoryview(builtin_array.array('d', [4, 6])))
+    self.assertEqual(list(array.all_positions), [(1, 2), (3, 4), (5, 6)])
+
+  def test_extending_rejects_mismatched_lengths(self):
+    array = arrays.FastPosArray()
+    with self.assertRaises(ValueError):
+      array.extend_xy([1, 2], [3])
+
+  def test_exporting_as_memoryview(self):
+    array = arrays.FastPosArray()
+    array.extend_xy([1, 3], [2, 4])
+
+    view = array.as_memoryview()
+    self.assertEqual(view.format, 'f')
+    self.assertEqual(view.tolist(), [1, 2, 3, 4])
+    # The buffer is preallocated, so appending doesn't pull it out from
+    # under the view.
+    array.append(5, 6)
+    self.assertEqual(view.tolist(), [1, 2, 3, 4])
+    self.assertEqual(array.num_positions(), 3)
+
+  def test_deleting_first_keeps_the_rest_in_place(self):
+    array = arrays.FastPosArray(capacity=4)
+    array.extend_xy([0, 1, 2, 3], [0, 0, 0, 0])
+    view = array.xy_view()
+
+    array.delete_first(2)
+    self.assertEqual(list(array.all_positions), [(2, 0), (3, 0)])
+    self.assertTrue(numpy.shares_memory(view, array.xy_view()))
+
+  def test_full_window_slides_back_without_growing(self):
+    array = arrays.FastPosArray(capacity=4)
+    buffer = array._buffer
+    for i in range(100):
+      if array.num_positions() == 4:
+        array.delete_first(1)
+      array.append(i, -i)
+
+    self.assertEqual(list(array.all_positions),
+                     [(96, -96), (97, -97), (98, -98), (99, -99)])
+    self.assertIs(array._buffer, buffer)
+
+  def test_growing_past_capacity(self):
+    array = arrays.FastPosArray(capacity=1)
+    array.extend_xy(range(100), range(100, 200))
+    array.delete_first(50)
+    array.extend_xy(range(100), range(100))
+
+    self.assertEqual(array.num_positions(), 150)
+    self.assertEqual(next(array.all_positions), (50, 150))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,187 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Times Simulation.advance() and Simulation.draw() in a set of named
+# scenarios and compares the results against a stored baseline.
+#
+# $ python3 benchmark.py                      # Run everything, check baseline.
+# $ python3 benchmark.py flakes_10k wind_max  # Run some scenarios.
+# $ python3 benchmark.py --save_baseline      # Record a new baseline.
+#
+# Timings depend a lot on the machine, so record the baseline on the
+# machine you compare on.
+
+import argparse
+import collections
+import json
+import os
+import random
+import statistics
+import sys
+import timeit
+
+import pygame
+import pygame.freetype
+
+import clocks
+import headless
+import simulation
+import snow
+import winds
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             'profiling', 'benchmark_baseline.json')
+# Fail if a scenario gets this much slower than the baseline.
+REGRESSION_THRESHOLD = 0.25
+WARMUP_TICKS = 5
+TIMED_TICKS = 30
+SCREEN_SIZE = (640, 480)
+CALM = pygame.math.Vector2(0, 0)
+# As hard as a gust can blow.
+MAX_WIND = pygame.math.Vector2(-winds.MAX_POSSIBLE_MAGNITUDE / 5, 0)
+
+
+Scenario = collections.namedtuple(
+    'Scenario', ['flakes', 'obstacles', 'wind', 'snowballs_per_tick',
+                 'moving_obstacles'], defaults=(0,))
+
+
+# Every scenario keeps this many flakes in the air; the snowfall is topped
+# up before each tick so landed flakes don't make later ticks cheaper.
+SCENARIOS = collections.OrderedDict([
+    ('flakes_1k', Scenario(1000, 20, CALM, 0)),
+    ('flakes_10k', Scenario(10000, 20, CALM, 0)),
+    ('flakes_100k', Scenario(100000, 20, CALM, 0)),
+    ('obstacles_20', Scenario(10000, 20, CALM, 0)),
+    ('obstacles_1k', Scenario(10000, 1000, CALM, 0)),
+    ('obstacles_10k', Scenario(10000, 10000, CALM, 0)),
+    ('wind_calm', Scenario(10000, 20, CALM, 0)),
+    ('wind_max', Scenario(10000, 20, MAX_WIND, 0)),
+    ('snowball_storm', Scenario(1000, 20, CALM, 8)),
+    ('moving_obstacles_100', Scenario(10000, 1000, CALM, 0, 100)),
+])
+
+
+def _top_up(snowfall, flakes, size):
+  missing = flakes - snowfall.snowflakes.num_positions()
+  if missing > 0:
+    snowfall.snowflakes.extend_xy(
+        [random.uniform(0, size.x * 2) for _ in range(missing)],
+        [random.uniform(-size.y, size.y) for _ in range(missing)])
+
+
+def run_scenario(scenario):
+  """Returns the median advance() and draw() times in ms for a scenario."""
+  random.seed(0)
+  snow.Snowfall.reset_snowflake_angle()
+  size = pygame.math.Vector2(SCREEN_SIZE)
+  screen = pygame.display.set_mode(SCREEN_SIZE)
+  game = simulation.Simulation(
+      screen, size, clock=None, world_clock=clocks.SimulatedClock(),
+      num_obstacles=scenario.obstacles,
+      num_moving_obstacles=scenario.moving_obstacles,
+      wind=winds.StaticWind(pygame.math.Vector2(scenario.wind)))
+  game.snowfall.spawn_rate = 0
+
+  advance_secs = []
+  draw_secs = []
+  for tick in range(WARMUP_TICKS + TIMED_TICKS):
+    _top_up(game.snowfall, scenario.flakes, size)
+    for _ in range(scenario.snowballs_per_tick):
+      game.snowfall.spawn_snowball(pygame.math.Vector2(
+          random.uniform(0, size.x), random.uniform(0, size.y)))
+
+    start = timeit.default_timer()
+    game.advance()
+    advanced = timeit.default_timer()
+    game.draw()
+    drawn = timeit.default_timer()
+    if tick >= WARMUP_TICKS:
+      advance_secs.append(advanced - start)
+      draw_secs.append(drawn - advanced)
+
+  return {'advance_ms': statistics.median(advance_secs) * 1000,
+          'draw_ms': statistics.median(draw_secs) * 1000}
+
+
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+  """Returns a message for each timing that's too slow vs. the baseline."""
+  regressions = []
+  for name, timings in sorted(results.items()):
+    for metric, value in sorted(timings.items()):
+      expected = baseline.get(name, {}).get(metric)
+      if expected and value > expected * (1 + threshold):
+        regressions.append('%s %s: %.2f ms, baseline %.2f ms (+%.0f%%)' %
+                           (name, metric, value, expected,
+                            (value / expected - 1) * 100))
+  return regressions
+
+
+def parse_args(argv):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('scenarios', nargs='*',
+                      help='scenarios to run; defaults to all of %s' %
+                      ', '.join(SCENARIOS))
+  parser.add_argument('--baseline', default=BASELINE_PATH,
+                      help='baseline JSON file', required=False)
+  parser.add_argument('--save_baseline', action='store_true',
+                      help='store the results as the new baseline',
+                      required=False)
+  parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                      help='allowed slowdown, e.g. 0.25 for 25%%',
+                      required=False)
+  args = parser.parse_args(argv)
+  unknown = set(args.scenarios) - set(SCENARIOS)
+  if unknown:
+    parser.error('unknown scenarios: %s' % ', '.join(sorted(unknown)))
+  return args
+
+
+def main(argv):
+  args = parse_args(argv)
+  # Draw into an invisible screen.
+  headless.init_headless()
+  pygame.freetype.init()
+
+  results = collections.OrderedDict()
+  for name in args.scenarios or SCENARIOS:
+    results[name] = run_scenario(SCENARIOS[name])
+    print('%-15s advance %8.2f ms   draw %8.2f ms' %
+          (name, results[name]['advance_ms'], results[name]['draw_ms']))
+
+  if args.save_baseline:
+    baseline = {}
+    if os.path.exists(args.baseline):
+      with open(args.baseline) as f:
+        baseline = json.load(f)
+    baseline.update(results)
+    with open(args.baseline, 'w') as f:
+      json.dump(baseline, f, indent=2, sort_keys=True)
+      f.write('\n')
+    print('Saved baseline to %s' % args.baseline)
+    return 0
+
+  if not os.path.exists(args.baseline):
+    print('No baseline at %s; run with --save_baseline first.' % args.baseline)
+    return 0
+  with open(args.baseline) as f:
+    regressions = find_regressions(results, json.load(f), args.threshold)
+  for regression in regressions:
+    print('REGRESSION: %s' % regression)
+  return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
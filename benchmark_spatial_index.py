@@ -0,0 +1,83 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares the kd-tree and the hash grid on levels of different sizes.
+#
+# $ python3 benchmark_spatial_index.py
+
+import math
+import numpy
+import pygame
+import random
+import timeit
+
+import hashgrid
+import kdtree
+import obstacles
+
+
+SPATIAL_INDEXES = (('kdtree', kdtree.obstacle_kd_tree),
+                   ('hashgrid', hashgrid.obstacle_hash_grid))
+OBSTACLE_COUNTS = (20, 1000, 20000)
+NUM_SEARCHES = 1000
+NUM_QUERY_POINTS = 100000
+
+
+def _level_size(num_obstacles):
+  # Grow the level with the obstacle count so obstacles are about as
+  # crowded as in the normal 20-obstacle, 640x480 level.
+  scale = math.sqrt(num_obstacles / 20)
+  return (int(640 * scale), int(480 * scale))
+
+
+def _best_of(function, repeat=3, number=1):
+  return min(timeit.repeat(function, repeat=repeat, number=number)) / number
+
+
+def benchmark(name, spatial_index, num_obstacles):
+  random.seed(0)
+  level_size = _level_size(num_obstacles)
+  level = [obstacles.random_obstacle(level_size) for _ in range(num_obstacles)]
+  points = [(random.uniform(0, level_size[0]), random.uniform(0, level_size[1]))
+            for _ in range(max(NUM_SEARCHES, NUM_QUERY_POINTS))]
+  xs = numpy.array([x for x, _ in points])
+  ys = numpy.array([y for _, y in points])
+  index = spatial_index(level)
+
+  def search_all():
+    for point in points[:NUM_SEARCHES]:
+      index.search(point)
+
+  def query_all():
+    index.query_points(xs[:NUM_QUERY_POINTS], ys[:NUM_QUERY_POINTS],
+                       hit_rect=lambda o: o.bounding_rect_with_snow)
+
+  build_secs = _best_of(lambda: spatial_index(level))
+  search_secs = _best_of(search_all)
+  query_secs = _best_of(query_all)
+  print('%-9s %6d obstacles: build %8.2f ms, %d searches %8.2f ms, '
+        'query_points(%d) %8.2f ms' %
+        (name, num_obstacles, build_secs * 1000, NUM_SEARCHES,
+         search_secs * 1000, NUM_QUERY_POINTS, query_secs * 1000))
+
+
+def main():
+  pygame.init()
+  for num_obstacles in OBSTACLE_COUNTS:
+    for name, spatial_index in SPATIAL_INDEXES:
+      benchmark(name, spatial_index, num_obstacles)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,38 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import benchmark
+
+
+class FindRegressionsTest(unittest.TestCase):
+
+  def test_reports_timings_over_threshold(self):
+    baseline = {'flakes_1k': {'advance_ms': 10.0, 'draw_ms': 2.0}}
+    results = {'flakes_1k': {'advance_ms': 13.0, 'draw_ms': 2.4}}
+
+    regressions = benchmark.find_regressions(results, baseline, threshold=0.25)
+
+    self.assertEqual(1, len(regressions))
+    self.assertIn('flakes_1k advance_ms', regressions[0])
+
+  def test_ignores_scenarios_missing_from_baseline(self):
+    results = {'wind_max': {'advance_ms': 100.0, 'draw_ms': 100.0}}
+
+    self.assertEqual([], benchmark.find_regressions(results, {}))
+
+
+if __name__ == '__main__':
+  unittest.main()
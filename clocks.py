@@ -0,0 +1,86 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+
+# How much world time passes in one Simulation.advance(). The game loop
+# advances the simulation 30 times a second.
+SECONDS_PER_TICK = 1.0 / 30
+# Don't try to catch up more than this many ticks in one frame.
+MAX_TICKS_PER_FRAME = 4
+
+
+class WallClock(object):
+  """Reads the time off the wall, like time.time()."""
+
+  def now(self):
+    return time.time()
+
+  def tick(self):
+    pass
+
+
+class SimulatedClock(object):
+  """A clock that only moves when the simulation advances.
+
+  Timers driven by this clock (wind gusts, speech bubbles and so on) behave
+  the same however fast the simulation is stepped, so runs that step it as
+  fast as they can see the same world as someone playing in real time."""
+
+  def __init__(self, start=0.0, seconds_per_tick=SECONDS_PER_TICK):
+    self._now = start
+    self.seconds_per_tick = seconds_per_tick
+
+  def now(self):
+    return self._now
+
+  def tick(self):
+    self._now += self.seconds_per_tick
+
+  def advance(self, seconds):
+    self._now += seconds
+
+
+class FixedTimestep(object):
+  """Decides how many fixed-length ticks to run for each rendered frame.
+
+  Time that passed is banked and paid out as whole ticks; what's left over
+  is alpha, how far the frame is between the last two ticks. If a frame is
+  so slow that more than max_ticks_per_frame are owed, the rest is dropped
+  instead of making the next frame slower still."""
+
+  def __init__(self, seconds_per_tick=SECONDS_PER_TICK,
+               max_ticks_per_frame=MAX_TICKS_PER_FRAME):
+    self.seconds_per_tick = seconds_per_tick
+    self.max_ticks_per_frame = max_ticks_per_frame
+    self._banked = 0.0
+    # Simulation time thrown away so far.
+    self.dropped_seconds = 0.0
+
+  def ticks_for_frame(self, elapsed_seconds):
+    """Returns how many ticks to run for a frame after elapsed_seconds."""
+    self._banked += elapsed_seconds
+    ticks = int(self._banked // self.seconds_per_tick)
+    self._banked -= ticks * self.seconds_per_tick
+    if ticks > self.max_ticks_per_frame:
+      self.dropped_seconds += ((ticks - self.max_ticks_per_frame) *
+                               self.seconds_per_tick)
+      ticks = self.max_ticks_per_frame
+    return ticks
+
+  @property
+  def alpha(self):
+    """How far from the last tick to the next one we are, from 0 to 1."""
+    return self._banked / self.seconds_per_tick
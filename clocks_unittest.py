@@ -0,0 +1,78 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pygame
+import pygame.freetype
+import unittest
+
+import clocks
+import speech_bubble
+
+
+class SimulatedClockTest(unittest.TestCase):
+
+  def test_only_moves_when_ticked(self):
+    clock = clocks.SimulatedClock(start=10.0, seconds_per_tick=0.5)
+    self.assertEqual(10.0, clock.now())
+    self.assertEqual(10.0, clock.now())
+
+    clock.tick()
+    clock.tick()
+
+    self.assertEqual(11.0, clock.now())
+
+  def test_advance(self):
+    clock = clocks.SimulatedClock()
+    clock.advance(3.0)
+    self.assertEqual(3.0, clock.now())
+
+  def test_speech_bubble_lasts_for_world_time(self):
+    pygame.freetype.init()
+    clock = clocks.SimulatedClock(seconds_per_tick=1.0)
+    bubble = speech_bubble.SpeechBubble('Hi', duration=2, world_clock=clock)
+
+    clock.tick()
+    clock.tick()
+    self.assertFalse(bubble.done())
+    clock.tick()
+    self.assertTrue(bubble.done())
+
+
+class FixedTimestepTest(unittest.TestCase):
+
+  def test_pays_out_whole_ticks_and_keeps_the_rest(self):
+    timestep = clocks.FixedTimestep(seconds_per_tick=0.25)
+
+    self.assertEqual(timestep.ticks_for_frame(0.125), 0)
+    self.assertEqual(timestep.alpha, 0.5)
+    self.assertEqual(timestep.ticks_for_frame(0.5), 2)
+    self.assertEqual(timestep.alpha, 0.5)
+    self.assertEqual(timestep.ticks_for_frame(0.125), 1)
+    self.assertEqual(timestep.alpha, 0.0)
+    self.assertEqual(timestep.dropped_seconds, 0.0)
+
+  def test_drops_time_beyond_max_ticks_per_frame(self):
+    timestep = clocks.FixedTimestep(seconds_per_tick=0.25,
+                                    max_ticks_per_frame=2)
+
+    self.assertEqual(timestep.ticks_for_frame(1.375), 2)
+
+    self.assertEqual(timestep.dropped_seconds, 0.75)
+    self.assertEqual(timestep.alpha, 0.5)
+    # The next frame isn't slowed down by the slow one.
+    self.assertEqual(timestep.ticks_for_frame(0.25), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -24,6 +24,8 @@ SPACING = 10
 FONT_SIZE = 18
 RESIZE_AT_MOST_EVERY_X_SECS = 2
 TEXT_COLOR = pygame.Color(64, 64, 255)
+SPARKLINE_HEIGHT = 30
+SPARKLINE_COLOR = pygame.Color(64, 255, 64)
 
 
 class DebugPanel(world.Drawable):
@@ -35,6 +37,10 @@ class DebugPanel(world.Drawable):
     self._font = pygame.freetype.SysFont('Courier New', FONT_SIZE)
     self._row_height = self._font.get_rect('A').height
     self._last_resize_time = 0
+    # What the last draw() covered; text can stick out between resizes.
+    self._drawn_rect = pygame.Rect(self._bounding_rect)
+    # Recent values of something (like frame times) to plot below the text.
+    self.sparkline = []
 
   @property
   def bounding_rect(self):
@@ -65,21 +71,49 @@ class DebugPanel(world.Drawable):
     self._bounding_rect.width = key_column.width + \
         value_column.width + PADDING * 2 + 40
     self._bounding_rect.height = (
-        key_column.height + SPACING) * len(new_values.values())
+        key_column.height + SPACING) * len(new_values.values()) + \
+        SPARKLINE_HEIGHT + PADDING
 
   def draw(self, screen, viewpoint_pos):
     pygame.draw.rect(screen, pygame.Color(255, 0, 0), self._bounding_rect, 1)
+    drawn_rect = pygame.Rect(self._bounding_rect)
 
     i = 0
     for key, value in self._debugged_values.items():
       x = self._bounding_rect.x + PADDING
       y = self._bounding_rect.y + PADDING + (SPACING + self._row_height) * i
       text = '%s: %s' % (key, value)
-      self._font.render_to(screen, (x, y), text, fgcolor=TEXT_COLOR)
+      drawn_rect.union_ip(
+          self._font.render_to(screen, (x, y), text, fgcolor=TEXT_COLOR))
       i += 1
 
+    self._draw_sparkline(screen)
+    self._drawn_rect = drawn_rect
+
+  def mark_dirty(self, region, viewpoint_pos):
+    region.add_rect(self._drawn_rect)
+
+  def _draw_sparkline(self, screen):
+    if len(self.sparkline) < 2:
+      return
+
+    # Scale so the highest value reaches the top, and squeeze all values
+    # into the panel's width.
+    area = pygame.Rect(self._bounding_rect.x + PADDING,
+                       self._bounding_rect.bottom - SPARKLINE_HEIGHT - PADDING,
+                       self._bounding_rect.width - PADDING * 2,
+                       SPARKLINE_HEIGHT)
+    highest = max(max(self.sparkline), 1e-9)
+    x_step = area.width / (len(self.sparkline) - 1)
+    points = [(area.x + i * x_step, area.bottom - value / highest * area.height)
+              for i, value in enumerate(self.sparkline)]
+    pygame.draw.lines(screen, SPARKLINE_COLOR, False, points)
+
 
 class NullDebugPanel(world.Drawable):
 
   def draw(self, screen, viewpoint_pos):
     pass
+
+  def mark_dirty(self, region, viewpoint_pos):
+    pass
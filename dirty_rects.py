@@ -0,0 +1,151 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import numpy
+import pygame
+
+
+# The screen is tracked in squares this big, so thousands of flakes mark a
+# few dozen tiles rather than thousands of one-pixel rects.
+TILE_SIZE = 32
+
+
+class DirtyRegion(object):
+  """The parts of the screen that may look different than last frame.
+
+  Drawables mark what they draw with mark_dirty(); see world.Drawable.
+  Everything is in screen coordinates."""
+
+  def __init__(self, size, tile_size=TILE_SIZE):
+    width, height = int(size[0]), int(size[1])
+    self._screen_rect = pygame.Rect(0, 0, width, height)
+    self._tile_size = tile_size
+    self._tiles = numpy.zeros((math.ceil(width / tile_size),
+                               math.ceil(height / tile_size)), dtype=bool)
+    # Where the world was drawn from; None if no world was drawn.
+    self.viewpoint_pos = None
+
+  @property
+  def everything(self):
+    return bool(self._tiles.all())
+
+  def mark_all(self):
+    self._tiles[:, :] = True
+
+  def add_rect(self, rect):
+    # Drawing rounds float positions either way; widen by a pixel to match.
+    rect = pygame.Rect(rect).inflate(2, 2).clip(self._screen_rect)
+    if not rect.width or not rect.height:
+      return
+    tile = self._tile_size
+    self._tiles[rect.left // tile:(rect.right - 1) // tile + 1,
+                rect.top // tile:(rect.bottom - 1) // tile + 1] = True
+
+  def add_points(self, xs, ys):
+    """Marks single pixels, given as integer numpy arrays."""
+    visible = ((xs >= 0) & (xs < self._screen_rect.width) &
+               (ys >= 0) & (ys < self._screen_rect.height))
+    self._tiles[xs[visible] // self._tile_size,
+                ys[visible] // self._tile_size] = True
+
+  def union(self, other):
+    """Returns a new region covering both this region and other."""
+    union = DirtyRegion(self._screen_rect.size, self._tile_size)
+    numpy.logical_or(self._tiles, other._tiles, out=union._tiles)
+    union.viewpoint_pos = self.viewpoint_pos
+    return union
+
+  def rects(self):
+    """Returns a few rects that together cover the region.
+
+    Neighbouring tiles in a row become one rect, and a rect grows
+    downwards while the rows below have a run of exactly the same width."""
+    tile = self._tile_size
+    rects = []
+    runs_above = {}
+    for row in range(self._tiles.shape[1]):
+      columns = numpy.flatnonzero(self._tiles[:, row])
+      if not len(columns):
+        runs_above = {}
+        continue
+      gaps = numpy.flatnonzero(numpy.diff(columns) != 1) + 1
+      runs = {}
+      for run in numpy.split(columns, gaps):
+        span = (int(run[0]), int(run[-1]) + 1)
+        rect = runs_above.get(span)
+        if rect:
+          rect.height += tile
+        else:
+          rect = pygame.Rect(span[0] * tile, row * tile,
+                             (span[1] - span[0]) * tile, tile)
+          rects.append(rect)
+        runs[span] = rect
+      runs_above = runs
+    return [rect.clip(self._screen_rect) for rect in rects]
+
+
+class FlipDisplay(object):
+  """Puts the whole screen on the display every frame."""
+
+  def new_region(self):
+    # Nothing to mark.
+    return None
+
+  def present(self, region):
+    pygame.display.flip()
+
+  def invalidate(self):
+    pass
+
+
+class DirtyRectDisplay(object):
+  """Only puts the parts of the screen that changed on the display.
+
+  That's what changed this frame, and what changed last frame (so it can be
+  erased). If the camera moved, everything changed, so that's a full flip.
+
+  display = DirtyRectDisplay(screen.get_size())
+  region = display.new_region()
+  game.draw(dirty_region=region)
+  display.present(region)"""
+
+  def __init__(self, size, tile_size=TILE_SIZE):
+    self._size = size
+    self._tile_size = tile_size
+    self._last_region = None
+    # How many frames went out as a flip and as rects, for the curious.
+    self.full_updates = 0
+    self.partial_updates = 0
+
+  def new_region(self):
+    return DirtyRegion(self._size, self._tile_size)
+
+  def present(self, region):
+    last_region, self._last_region = self._last_region, region
+    if (last_region is None or region.everything or
+        region.viewpoint_pos is None or
+        region.viewpoint_pos != last_region.viewpoint_pos):
+      self.full_updates += 1
+      pygame.display.flip()
+      return
+
+    self.partial_updates += 1
+    rects = region.union(last_region).rects()
+    if rects:
+      pygame.display.update(rects)
+
+  def invalidate(self):
+    """Makes the next frame a full flip, e.g. when the window was covered."""
+    self._last_region = None
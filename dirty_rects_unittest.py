@@ -0,0 +1,189 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy
+import pygame
+import pygame.freetype
+import random
+import unittest
+from unittest import mock
+
+import clocks
+import dirty_rects
+import headless
+import simulation
+
+
+SIZE = (640, 480)
+
+
+def _covered(rects):
+  pixels = numpy.zeros(SIZE, dtype=bool)
+  for rect in rects:
+    pixels[rect.left:rect.right, rect.top:rect.bottom] = True
+  return pixels
+
+
+class DirtyRegionTest(unittest.TestCase):
+
+  def testStartsClean(self):
+    region = dirty_rects.DirtyRegion(SIZE)
+    self.assertEqual(region.rects(), [])
+    self.assertFalse(region.everything)
+
+  def testRectsCoverWhatWasMarked(self):
+    region = dirty_rects.DirtyRegion(SIZE)
+    marked = [pygame.Rect(10, 10, 5, 5), pygame.Rect(300, 200, 100, 70),
+              pygame.Rect(630, 470, 50, 50)]
+    for rect in marked:
+      region.add_rect(rect)
+
+    covered = _covered(region.rects())
+    for rect in marked:
+      rect = rect.clip(pygame.Rect((0, 0), SIZE))
+      self.assertTrue(covered[rect.left:rect.right, rect.top:rect.bottom].all())
+    # But not much more than that.
+    self.assertLess(covered.sum(), 0.1 * SIZE[0] * SIZE[1])
+
+  def testMergesNeighbouringTiles(self):
+    region = dirty_rects.DirtyRegion(SIZE, tile_size=32)
+    region.add_rect(pygame.Rect(40, 40, 100, 100))
+
+    self.assertEqual(region.rects(), [pygame.Rect(32, 32, 128, 128)])
+
+  def testIgnoresWhatIsOffScreen(self):
+    region = dirty_rects.DirtyRegion(SIZE)
+    region.add_rect(pygame.Rect(-100, -100, 50, 50))
+    region.add_points(numpy.array([-1, 640, 5]), numpy.array([5, 5, 480]))
+
+    self.assertEqual(region.rects(), [])
+
+  def testPointsMarkTheirTiles(self):
+    region = dirty_rects.DirtyRegion(SIZE, tile_size=32)
+    region.add_points(numpy.array([1, 2, 100]), numpy.array([1, 2, 479]))
+
+    self.assertEqual(region.rects(), [pygame.Rect(0, 0, 32, 32),
+                                      pygame.Rect(96, 448, 32, 32)])
+
+  def testUnionHasBoth(self):
+    first = dirty_rects.DirtyRegion(SIZE, tile_size=32)
+    first.add_rect(pygame.Rect(40, 40, 10, 10))
+    second = dirty_rects.DirtyRegion(SIZE, tile_size=32)
+    second.add_rect(pygame.Rect(400, 400, 10, 10))
+
+    self.assertEqual(first.union(second).rects(),
+                     [pygame.Rect(32, 32, 32, 32),
+                      pygame.Rect(384, 384, 32, 32)])
+
+
+class DirtyRectDisplayTest(unittest.TestCase):
+
+  def _region(self, display, viewpoint_pos, rect):
+    region = display.new_region()
+    region.viewpoint_pos = pygame.math.Vector2(viewpoint_pos)
+    region.add_rect(rect)
+    return region
+
+  @mock.patch('pygame.display.update')
+  @mock.patch('pygame.display.flip')
+  def testFlipsOnlyWhenTheCameraMoves(self, flip, update):
+    display = dirty_rects.DirtyRectDisplay(SIZE, tile_size=32)
+    display.present(self._region(display, (0, 0), pygame.Rect(40, 40, 1, 1)))
+    self.assertEqual(flip.call_count, 1)
+
+    # The previous frame's rect is updated too, to erase what was there.
+    display.present(self._region(display, (0, 0), pygame.Rect(400, 40, 1, 1)))
+    self.assertEqual(flip.call_count, 1)
+    update.assert_called_once_with([pygame.Rect(32, 32, 32, 32),
+                                    pygame.Rect(384, 32, 32, 32)])
+
+    display.present(self._region(display, (1, 0), pygame.Rect(400, 40, 1, 1)))
+    self.assertEqual(flip.call_count, 2)
+    self.assertEqual((display.full_updates, display.partial_updates), (2, 1))
+
+  @mock.patch('pygame.display.update')
+  @mock.patch('pygame.display.flip')
+  def testInvalidateFlipsNextFrame(self, flip, update):
+    display = dirty_rects.DirtyRectDisplay(SIZE)
+    display.present(self._region(display, (0, 0), pygame.Rect(0, 0, 1, 1)))
+    display.invalidate()
+    display.present(self._region(display, (0, 0), pygame.Rect(0, 0, 1, 1)))
+
+    self.assertEqual(flip.call_count, 2)
+    update.assert_not_called()
+
+
+class SimulationDirtyRegionTest(unittest.TestCase):
+
+  def testStillWorldOnlyMarksWhatMoves(self):
+    headless.init_headless()
+    pygame.freetype.init()
+    screen = pygame.display.set_mode(SIZE)
+    game = simulation.Simulation(screen, pygame.math.Vector2(SIZE),
+                                 clock=None,
+                                 world_clock=clocks.SimulatedClock())
+    game.snowfall.spawn_rate = 0
+    game.advance()
+
+    region = dirty_rects.DirtyRegion(SIZE)
+    game.draw(dirty_region=region)
+
+    self.assertEqual(region.viewpoint_pos, game.viewpoint_pos)
+    self.assertFalse(region.everything)
+    covered = _covered(region.rects())
+    player = game.snapshot().player.bounding_rect.move(-game.viewpoint_pos)
+    self.assertTrue(
+        covered[player.left:player.right, player.top:player.bottom].all())
+
+  def testPartialUpdatesShowTheSameAsFullFrames(self):
+    headless.init_headless()
+    pygame.freetype.init()
+    screen = pygame.display.set_mode(SIZE)
+    random.seed(1)
+    game = simulation.Simulation(screen, pygame.math.Vector2(SIZE),
+                                 clock=None,
+                                 world_clock=clocks.SimulatedClock(),
+                                 num_moving_obstacles=3)
+    game.snowfall.spawn_rate = 200
+    display = dirty_rects.DirtyRectDisplay(SIZE)
+    # What the display would be showing: only what present() puts there.
+    shown = pygame.Surface(SIZE)
+
+    def flip():
+      shown.blit(screen, (0, 0))
+
+    def update(rects):
+      for rect in rects:
+        shown.blit(screen, rect, rect)
+
+    with mock.patch('pygame.display.flip', flip), \
+         mock.patch('pygame.display.update', update):
+      for tick in range(150):
+        if tick == 20:
+          game._player.say('Hello!', duration_secs=1)
+        game.advance()
+        screen.fill((0, 0, 0))
+        region = display.new_region()
+        game.draw(alpha=0.5, dirty_region=region)
+        display.present(region)
+
+        numpy.testing.assert_array_equal(pygame.surfarray.array3d(shown),
+                                         pygame.surfarray.array3d(screen),
+                                         err_msg='at tick %d' % tick)
+
+    self.assertGreater(display.partial_updates, 100)
+
+
+if __name__ == '__main__':
+  unittest.main()
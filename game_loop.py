@@ -12,11 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import pygame
 import pygame.freetype
 
+import dirty_rects
 import game_over
+import kdtree
 import simulation
+import threaded_simulation
+import tracing
 import world_controls
 
 
@@ -24,7 +29,8 @@ TARGET_FPS = 30.0
 COLOR_BLACK = pygame.Color(0, 0, 0)
 
 
-def demo(start_hidden):
+def demo(start_hidden, spatial_index=kdtree.obstacle_kd_tree, snow_workers=1,
+         trace_path=None, threaded=False, dirty_rect_updates=False):
   size = (640, 480)
   screen = pygame.display.set_mode(size)
   if start_hidden:
@@ -32,34 +38,84 @@ def demo(start_hidden):
 
   pygame.freetype.init()
   clock = pygame.time.Clock()
-  game = simulation.Simulation(screen, pygame.math.Vector2(size), clock)
-  weather_control = world_controls.WeatherControl(game.snowfall)
+  game = simulation.Simulation(screen, pygame.math.Vector2(size), clock,
+                               spatial_index=spatial_index,
+                               snow_workers=snow_workers)
+  weather_control = world_controls.WeatherControl(game.snowfall,
+                                                  world_clock=game.world_clock)
   world_editor = world_controls.WorldEditor(game)
+  tracer = None
+  if trace_path:
+    # Written at exit, or whenever F9 is pressed.
+    tracer = tracing.Tracer(trace_path)
+    game.timers.tracer = tracer
   you_died = game_over.GameOverText()
+  # Software-rendered displays spend a lot of time copying whole frames.
+  display = dirty_rects.FlipDisplay()
+  if dirty_rect_updates:
+    display = dirty_rects.DirtyRectDisplay(size)
 
-  time_left = 0.0
-  while True:
-    screen.fill(COLOR_BLACK)
-    dt = clock.tick(TARGET_FPS)
-    time_left += dt / TARGET_FPS
-    while time_left > 1.0:
-      # TODO: apply alpha factor to all speed vectors at high FPS to fix jank.
-      # https://www.gamedev.net/forums/topic/629618-proper-framerate-independent-game-loop/
-      game.advance()
-      time_left -= 1.0
-    game.draw()
-    if game.game_ended:
-      you_died.draw(screen, game.viewpoint_pos)
-    pygame.display.flip()
+  sim_thread = None
+  # Input changes the world, so it has to wait for the simulation thread.
+  input_lock = contextlib.nullcontext()
+  if threaded:
+    sim_thread = threaded_simulation.SimulationThread(game)
+    input_lock = sim_thread.lock
+    sim_thread.start()
 
-    for event in pygame.event.get():
-      if event.type == pygame.QUIT:
-        return
-      if event.type == pygame.ACTIVEEVENT and event.state == 2:
-        if event.gain:
-          game.resume()
+  try:
+    while True:
+      dt = clock.tick(TARGET_FPS)
+      # Everything but waiting for the next frame.
+      with game.timers.time('frame'):
+        screen.fill(COLOR_BLACK)
+        region = display.new_region()
+        if sim_thread:
+          snapshot, alpha = sim_thread.latest()
+          game.draw_snapshot(snapshot, alpha, region)
+          game_ended = snapshot.game_ended
+          viewpoint_pos = snapshot.viewpoint_pos
         else:
-          game.suspend()
+          # Fixed-length ticks, drawn in between; see
+          # https://gafferongames.com/post/fix_your_timestep/
+          game.advance_for(dt / 1000)
+          game.draw(alpha=game.timestep.alpha, dirty_region=region)
+          game_ended = game.game_ended
+          viewpoint_pos = game.viewpoint_pos
+        if game_ended:
+          you_died.draw(screen, viewpoint_pos)
+          if region is not None:
+            you_died.mark_dirty(region, viewpoint_pos)
+        display.present(region)
 
-      if not world_editor.act_on_input(event, game.viewpoint_pos):
-        weather_control.act_on_input(event, game.viewpoint_pos)
+      with input_lock:
+        if not _handle_events(game, world_editor, weather_control, tracer,
+                              display):
+          return
+  finally:
+    if sim_thread:
+      sim_thread.stop()
+
+
+def _handle_events(game, world_editor, weather_control, tracer, display):
+  """Returns False when it's time to quit."""
+  for event in pygame.event.get():
+    if event.type == pygame.QUIT:
+      return False
+    if event.type == pygame.KEYDOWN and event.key == pygame.K_F9 and tracer:
+      print('Wrote trace to %s' % tracer.flush())
+    if event.type == pygame.VIDEOEXPOSE:
+      display.invalidate()
+    if event.type == pygame.ACTIVEEVENT and event.state == 2:
+      if event.gain:
+        game.resume()
+        display.invalidate()
+      else:
+        game.suspend()
+
+    if world_editor.act_on_input(event, game.viewpoint_pos):
+      # Dragged obstacles can be ones that otherwise never change.
+      display.invalidate()
+    else:
+      weather_control.act_on_input(event, game.viewpoint_pos)
+  return True
@@ -0,0 +1,251 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import numpy
+
+import kdtree
+
+
+CELL_SIZE = 64
+# Obstacles covering more cells than this (like the ground) aren't put in
+# any cell; every query checks them instead.
+MAX_CELLS_PER_OBSTACLE = 256
+
+
+def _bounding_rect(obstacle):
+  return obstacle.bounding_rect
+
+
+def _indexed_rect(obstacle):
+  # Put obstacles in the cells covered by their snow as well, or snowflakes
+  # landing on the snow won't find them.
+  if hasattr(obstacle, 'bounding_rect_with_snow'):
+    return obstacle.bounding_rect_with_snow
+  return obstacle.bounding_rect
+
+
+def _cell_key(cell_x, cell_y):
+  # Packs a cell coordinate pair into one integer, so cells can be looked up
+  # with numpy.searchsorted.
+  return cell_x * (1 << 32) + (cell_y + (1 << 31))
+
+
+def obstacle_hash_grid(obstacles, cell_size=CELL_SIZE):
+  return ObstacleHashGrid(obstacles, cell_size)
+
+
+class ObstacleHashGrid(object):
+  """Buckets obstacles into a uniform grid of square cells.
+
+  Answers the same queries as kdtree.ObstacleKdTree, but a point lookup
+  only has to check the obstacles in the point's cell. Obstacles are
+  reported in the order they were given, which plays the part of the
+  kd-tree's preorder."""
+
+  def __init__(self, obstacles, cell_size):
+    self._obstacles = tuple(obstacles)
+    self._cell_size = cell_size
+    self.size = len(self._obstacles)
+    self._index_of = {id(obstacle): index
+                      for index, obstacle in enumerate(self._obstacles)}
+
+    # The (x_cells, y_cells) each obstacle is in, or None if it's oversized.
+    self._placements = [None] * self.size
+    self._members = collections.defaultdict(set)
+    self._oversized_set = set()
+    for index, obstacle in enumerate(self._obstacles):
+      self._place(index, obstacle)
+    self._build_lookups()
+
+  def __repr__(self):
+    self._update_lookups()
+    return 'ObstacleHashGrid(%d obstacles, %d cells)' % (self.size,
+                                                         len(self._cells))
+
+  def _place(self, index, obstacle):
+    """Puts the obstacle in the cells its indexed rect covers.
+
+    Returns True if that's different from where it was."""
+    x_cells, y_cells = self._cell_ranges(_indexed_rect(obstacle))
+    placement = None
+    if len(x_cells) * len(y_cells) <= MAX_CELLS_PER_OBSTACLE:
+      placement = (x_cells, y_cells)
+    old_placement = self._placements[index]
+    if placement == old_placement and (placement or
+                                       index in self._oversized_set):
+      return False
+
+    if old_placement:
+      for cell in self._cells_in(old_placement):
+        self._members[cell].discard(index)
+        if not self._members[cell]:
+          del self._members[cell]
+    self._oversized_set.discard(index)
+
+    self._placements[index] = placement
+    if placement:
+      for cell in self._cells_in(placement):
+        self._members[cell].add(index)
+    else:
+      self._oversized_set.add(index)
+    return True
+
+  @staticmethod
+  def _cells_in(placement):
+    x_cells, y_cells = placement
+    return [(cell_x, cell_y) for cell_x in x_cells for cell_y in y_cells]
+
+  def refit(self, obstacle):
+    """Moves the obstacle to the right cells after its indexed rect changed.
+
+    If it moved into other cells, the lookup tables are rebuilt before the
+    next search, once however many obstacles moved in the meantime."""
+    if self._place(self._index_of[id(obstacle)], obstacle):
+      self._lookups_stale = True
+
+  def _update_lookups(self):
+    if self._lookups_stale:
+      self._build_lookups()
+
+  def _build_lookups(self):
+    self._lookups_stale = False
+    oversized = sorted(self._oversized_set)
+    self._oversized = tuple(oversized)
+    cells = {cell: sorted(indices) for cell, indices in self._members.items()}
+    # Queries without numpy look at these, with the oversized obstacles
+    # merged in (in order).
+    self._cells = {cell: tuple(sorted(indices + oversized))
+                   for cell, indices in cells.items()}
+    self._build_lookup_arrays(cells)
+
+  def _cell_ranges(self, rect):
+    step = self._cell_size
+    x_cells = range(rect.left // step,
+                    max(rect.right - 1, rect.left) // step + 1)
+    y_cells = range(rect.top // step,
+                    max(rect.bottom - 1, rect.top) // step + 1)
+    return x_cells, y_cells
+
+  def _build_lookup_arrays(self, cells):
+    # A flattened copy of the cells for query_points: the obstacles in the
+    # cell with key _keys[i] are _entries[_starts[i]:_starts[i] + _counts[i]].
+    keys = sorted(cells, key=lambda cell: _cell_key(*cell))
+    self._keys = numpy.array([_cell_key(*cell) for cell in keys],
+                             dtype=numpy.int64)
+    self._counts = numpy.array([len(cells[cell]) for cell in keys],
+                               dtype=numpy.intp)
+    self._starts = numpy.zeros(len(keys), dtype=numpy.intp)
+    numpy.cumsum(self._counts[:-1], out=self._starts[1:])
+    self._entries = numpy.array(
+        [index for cell in keys for index in cells[cell]], dtype=numpy.intp)
+
+  def search(self, pos):
+    """Returns the obstacles whose indexed rect contains pos, in order."""
+    self._update_lookups()
+    # Rect.collidepoint truncates toward zero, so do that too.
+    x, y = int(pos[0]), int(pos[1])
+    cell = (x // self._cell_size, y // self._cell_size)
+    indices = self._cells.get(cell, self._oversized)
+    return tuple(self._obstacles[i] for i in indices
+                 if _indexed_rect(self._obstacles[i]).collidepoint(x, y))
+
+  def quick_search(self, pos):
+    # Grid lookups are already cheap and exact; no need to cache anything.
+    return self.search(pos)
+
+  def query_rect(self, rect):
+    """Returns the obstacles whose indexed rect overlaps rect, in order."""
+    x_cells, y_cells = self._cell_ranges(rect)
+    if len(x_cells) * len(y_cells) > len(self._members):
+      # Cheaper to look through the cells than through the rect.
+      cells = [cell for cell in self._members
+               if cell[0] in x_cells and cell[1] in y_cells]
+    else:
+      cells = [cell for cell in self._cells_in((x_cells, y_cells))
+               if cell in self._members]
+    indices = set(self._oversized_set)
+    for cell in cells:
+      indices.update(self._members[cell])
+    return tuple(self._obstacles[i] for i in sorted(indices)
+                 if _indexed_rect(self._obstacles[i]).colliderect(rect))
+
+  def cache_stats(self):
+    return kdtree.CacheStats(hits=0, misses=0, cells=0)
+
+  def query_points(self, xs, ys, hit_rect=_bounding_rect):
+    """Finds the obstacle hit by each point in a batch.
+
+    Same contract as kdtree.ObstacleKdTree.query_points: returns the
+    walk_preorder() index of the first obstacle whose hit_rect contains
+    each point, or -1 if it hits nothing."""
+    self._update_lookups()
+    px = numpy.asarray(xs).astype(numpy.int64)
+    py = numpy.asarray(ys).astype(numpy.int64)
+    hits = numpy.full(len(px), -1, dtype=numpy.intp)
+
+    # Find the cell of each point; points in empty cells can only hit
+    # oversized obstacles.
+    in_cell = numpy.zeros(0, dtype=numpy.intp)
+    slots = in_cell
+    if len(self._keys):
+      point_keys = _cell_key(px // self._cell_size, py // self._cell_size)
+      slots = numpy.minimum(numpy.searchsorted(self._keys, point_keys),
+                            len(self._keys) - 1)
+      in_cell = numpy.flatnonzero(self._keys[slots] == point_keys)
+      slots = slots[in_cell]
+
+    # Only fetch the hit rects of obstacles that some point could hit.
+    candidates = numpy.union1d(self._entries_in(numpy.unique(slots)),
+                               numpy.array(self._oversized, dtype=numpy.intp))
+    rects = numpy.zeros((self.size, 4), dtype=numpy.int64)
+    for index in candidates.tolist():
+      rect = hit_rect(self._obstacles[index])
+      rects[index] = (rect.left, rect.top, rect.right, rect.bottom)
+
+    def contains(indices, x, y):
+      left, top, right, bottom = rects[indices].T
+      return (x >= left) & (x < right) & (y >= top) & (y < bottom)
+
+    # Cell entries are sorted, so the first one containing a point is the
+    # first obstacle in order.
+    starts = self._starts[slots]
+    counts = self._counts[slots]
+    cell_x = px[in_cell]
+    cell_y = py[in_cell]
+    cell_hits = numpy.full(len(in_cell), -1, dtype=numpy.intp)
+    for j in range(counts.max(initial=0)):
+      todo = numpy.flatnonzero((counts > j) & (cell_hits < 0))
+      obstacles = self._entries[starts[todo] + j]
+      inside = contains(obstacles, cell_x[todo], cell_y[todo])
+      cell_hits[todo[inside]] = obstacles[inside]
+    hits[in_cell] = cell_hits
+
+    # Oversized obstacles aren't in any cell; check every point against them
+    # and keep whichever hit comes first in order.
+    for index in self._oversized:
+      earlier = contains(index, px, py) & ((hits < 0) | (hits > index))
+      hits[earlier] = index
+
+    return hits
+
+  def _entries_in(self, slots):
+    counts = self._counts[slots]
+    # For each entry, its offset from the start of its cell.
+    offsets = (numpy.arange(counts.sum()) -
+               numpy.repeat(numpy.cumsum(counts) - counts, counts))
+    return self._entries[numpy.repeat(self._starts[slots], counts) + offsets]
+
+  def walk_preorder(self):
+    return iter(self._obstacles)
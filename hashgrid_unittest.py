@@ -0,0 +1,174 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pygame
+import random
+import unittest
+from unittest import mock
+
+import hashgrid
+import kdtree
+
+
+def obstacle(x, y, width=10, height=10):
+  class FakeObstacle(object):
+
+    def __init__(self, bounding_rect):
+      self._bounding_rect = bounding_rect
+
+    @property
+    def bounding_rect(self):
+      return self._bounding_rect
+
+    def __repr__(self):
+      return str(self._bounding_rect)
+
+  rect = pygame.Rect(x, y, width, height)
+  return FakeObstacle(rect)
+
+
+def random_obstacles(count):
+  return [obstacle(random.randint(-100, 500), random.randint(-100, 500),
+                   width=random.randint(1, 80), height=random.randint(1, 80))
+          for _ in range(count)]
+
+
+def first_hit(obstacles, point):
+  for index, candidate in enumerate(obstacles):
+    if candidate.bounding_rect.collidepoint(point):
+      return index
+  return -1
+
+
+class ObstacleHashGridTest(unittest.TestCase):
+
+  def test_walks_obstacles_in_given_order(self):
+    obstacles = [obstacle(100, 100), obstacle(5, 5), obstacle(50, 50)]
+    grid = hashgrid.obstacle_hash_grid(obstacles)
+    self.assertEqual(list(grid.walk_preorder()), obstacles)
+
+  def test_search_finds_all_obstacles_containing_point(self):
+    random.seed(0)
+    obstacles = random_obstacles(100)
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=32)
+
+    for _ in range(500):
+      point = (random.uniform(-120, 600), random.uniform(-120, 600))
+      expected = tuple(o for o in obstacles
+                       if o.bounding_rect.collidepoint(point))
+      self.assertEqual(grid.search(point), expected,
+                       msg='for point %s' % (point,))
+      self.assertEqual(grid.quick_search(point), expected)
+
+  def test_search_agrees_with_kd_tree(self):
+    random.seed(6)
+    obstacles = random_obstacles(100) + [obstacle(-1000, 400, width=5000)]
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=32)
+    tree = kdtree.obstacle_kd_tree(obstacles)
+
+    for _ in range(500):
+      point = (random.uniform(-120, 600), random.uniform(-120, 600))
+      self.assertEqual(set(grid.search(point)), set(tree.search(point)),
+                       msg='for point %s' % (point,))
+
+  def test_query_points_returns_index_of_first_hit(self):
+    random.seed(1)
+    obstacles = random_obstacles(100)
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=32)
+    points = [(random.uniform(-120, 600), random.uniform(-120, 600))
+              for _ in range(1000)]
+
+    xs, ys = zip(*points)
+    hits = grid.query_points(xs, ys)
+
+    self.assertEqual(list(hits), [first_hit(obstacles, p) for p in points])
+
+  def test_huge_obstacles_are_found_everywhere(self):
+    ground = obstacle(-100000, 100, width=200000, height=10000)
+    obstacles = [obstacle(10, 120), ground, obstacle(500, 90, height=20)]
+    grid = hashgrid.obstacle_hash_grid(obstacles)
+
+    self.assertEqual(grid.search((-5000, 5000)), (ground,))
+    self.assertEqual(
+        list(grid.query_points([-5000, 15, 505, 0], [5000, 125, 105, 0])),
+        [1, 0, 1, -1])
+
+  def test_empty_grid(self):
+    grid = hashgrid.obstacle_hash_grid([])
+    self.assertEqual(grid.search((1, 2)), ())
+    self.assertEqual(list(grid.query_points([1, 2], [3, 4])), [-1, -1])
+
+  def test_refit_after_obstacle_grows(self):
+    obstacles = [obstacle(100, 100), obstacle(300, 300)]
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=64)
+    self.assertEqual(grid.search((105, 20)), ())
+
+    # Like snow piling up on top of it, into the cells above.
+    obstacles[0].bounding_rect.y -= 90
+    obstacles[0].bounding_rect.height += 90
+    grid.refit(obstacles[0])
+
+    self.assertEqual(grid.search((105, 20)), (obstacles[0],))
+    self.assertEqual(list(grid.query_points([105, 305], [20, 305])), [0, 1])
+
+  def test_refits_rebuild_the_lookups_once_before_the_next_query(self):
+    random.seed(5)
+    obstacles = random_obstacles(50)
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=32)
+
+    with mock.patch.object(grid, '_build_lookups',
+                           wraps=grid._build_lookups) as build_lookups:
+      for moved in obstacles[:10]:
+        moved.bounding_rect.x += 200
+        grid.refit(moved)
+      self.assertEqual(build_lookups.call_count, 0)
+
+      points = [(random.uniform(-120, 800), random.uniform(-120, 600))
+                for _ in range(500)]
+      xs, ys = zip(*points)
+      hits = grid.query_points(xs, ys)
+      found = [grid.search(point) for point in points]
+
+    self.assertEqual(build_lookups.call_count, 1)
+    self.assertEqual(list(hits), [first_hit(obstacles, p) for p in points])
+    for point, candidates in zip(points, found):
+      self.assertEqual(
+          [o for o in candidates if o.bounding_rect.collidepoint(point)],
+          [o for o in obstacles if o.bounding_rect.collidepoint(point)])
+
+  def test_refit_into_oversized(self):
+    obstacles = [obstacle(100, 100), obstacle(300, 300)]
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=64)
+
+    obstacles[0].bounding_rect.width = 100000
+    grid.refit(obstacles[0])
+
+    self.assertEqual(grid.search((90000, 105)), (obstacles[0],))
+    self.assertEqual(list(grid.query_points([90000], [105])), [0])
+
+  def test_query_rect_finds_overlapping_obstacles(self):
+    random.seed(4)
+    obstacles = random_obstacles(100) + [obstacle(-1000, 400, width=5000)]
+    grid = hashgrid.obstacle_hash_grid(obstacles, cell_size=32)
+
+    for _ in range(100):
+      rect = pygame.Rect(random.randint(-120, 600), random.randint(-120, 600),
+                         random.randint(1, 300), random.randint(1, 300))
+      expected = tuple(o for o in obstacles
+                       if o.bounding_rect.colliderect(rect))
+      self.assertEqual(grid.query_rect(rect), expected, msg='for %s' % rect)
+
+
+if __name__ == '__main__':
+  unittest.main()
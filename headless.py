@@ -0,0 +1,123 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Runs simulations without a window or sound, one per seed, spread over a
+# process pool, and prints how they went as JSON.
+#
+# $ python3 headless.py --seeds 0-7 --ticks 1000 --spawn_rate 50
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import pygame
+import random
+import sys
+import timeit
+
+import clocks
+import simulation
+import snow
+
+
+Scenario = collections.namedtuple(
+    'Scenario', ['seed', 'ticks', 'spawn_rate', 'spatial_index', 'width',
+                 'height'])
+
+
+def init_headless():
+  """Sets up pygame with no window and no sound.
+
+  The player still reads the keyboard, so the video system has to be up,
+  but SDL's dummy driver never opens a window. The mixer is left off, which
+  keeps the wind quiet."""
+  os.environ['SDL_VIDEODRIVER'] = 'dummy'
+  os.environ['SDL_AUDIODRIVER'] = 'dummy'
+  pygame.display.init()
+
+
+def run_scenario(scenario):
+  """Builds a headless simulation for the scenario and runs it.
+
+  The simulation runs on a simulated clock, so a scenario gives the same
+  world every time it's run. Returns a dict suitable for JSON output."""
+  init_headless()
+  random.seed(scenario.seed)
+  snow.Snowfall.reset_snowflake_angle()
+  game = simulation.Simulation(
+      screen=None, size=pygame.math.Vector2(scenario.width, scenario.height),
+      clock=None,
+      spatial_index=simulation.SPATIAL_INDEXES[scenario.spatial_index],
+      world_clock=clocks.SimulatedClock())
+  game.snowfall.spawn_rate = scenario.spawn_rate
+  # Nobody's looking at the debug panel.
+  game.timers.enabled = False
+
+  peak_flakes = 0
+  start = timeit.default_timer()
+  for _ in range(scenario.ticks):
+    game.advance()
+    peak_flakes = max(peak_flakes, game.snowfall.snowflakes.num_positions())
+  elapsed = timeit.default_timer() - start
+
+  result = scenario._asdict()
+  result.update({'seconds': elapsed,
+                 'ticks_per_second': scenario.ticks / elapsed if elapsed else 0,
+                 'peak_flakes': peak_flakes,
+                 'game_ended': game.game_ended})
+  return result
+
+
+def run_scenarios(scenarios, processes=None):
+  """Runs the scenarios in a pool of processes; returns results in order."""
+  with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+    return list(pool.map(run_scenario, scenarios))
+
+
+def _seed_range(text):
+  first, _, last = text.partition('-')
+  return range(int(first), int(last or first) + 1)
+
+
+def parse_args(argv):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--seeds', type=_seed_range, default=_seed_range('0-3'),
+                      help='seeds to run, e.g. 0-7', required=False)
+  parser.add_argument('--ticks', type=int, default=1000,
+                      help='ticks to run each seed for', required=False)
+  parser.add_argument('--spawn_rate', type=int, default=10,
+                      help='snowflakes to spawn per tick', required=False)
+  parser.add_argument('--spatial_index',
+                      choices=sorted(simulation.SPATIAL_INDEXES),
+                      default='kdtree',
+                      help='how to look up obstacles', required=False)
+  parser.add_argument('--width', type=int, default=640, required=False)
+  parser.add_argument('--height', type=int, default=480, required=False)
+  parser.add_argument('--processes', type=int, default=None,
+                      help='defaults to one per core', required=False)
+  return parser.parse_args(argv)
+
+
+def main(argv):
+  args = parse_args(argv)
+  scenarios = [Scenario(seed, args.ticks, args.spawn_rate, args.spatial_index,
+                        args.width, args.height)
+               for seed in args.seeds]
+  json.dump(run_scenarios(scenarios, args.processes), sys.stdout, indent=2)
+  print()
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,57 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import headless
+
+
+def scenario(seed):
+  return headless.Scenario(seed=seed, ticks=50, spawn_rate=20,
+                           spatial_index='kdtree', width=640, height=480)
+
+
+def without_timings(result):
+  return {k: v for k, v in result.items()
+          if k not in ('seconds', 'ticks_per_second')}
+
+
+class HeadlessTest(unittest.TestCase):
+
+  def test_reports_scenario_and_results(self):
+    result = headless.run_scenario(scenario(seed=1))
+
+    self.assertEqual(1, result['seed'])
+    self.assertGreater(result['ticks_per_second'], 0)
+    self.assertGreater(result['peak_flakes'], 0)
+
+  def test_same_seed_gives_same_result(self):
+    first = headless.run_scenario(scenario(seed=2))
+    headless.run_scenario(scenario(seed=3))
+    second = headless.run_scenario(scenario(seed=2))
+
+    self.assertEqual(without_timings(first), without_timings(second))
+
+  def test_runs_scenarios_in_process_pool(self):
+    scenarios = [scenario(seed) for seed in range(2)]
+
+    results = headless.run_scenarios(scenarios, processes=2)
+
+    self.assertEqual([without_timings(headless.run_scenario(s))
+                      for s in scenarios],
+                     [without_timings(r) for r in results])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,90 +14,350 @@
 
 
 import collections
-import functools
+import numpy
 import pprint
 import pygame
 
 
-def _sort_by_axis(axis):
-  assert axis < 2, 'axis is either 0 = x, or 1 = y'
+# Side of the square cells quick_search() caches obstacles for, in pixels.
+CELL_SIZE = 20
+# The cell cache is emptied when it grows past this many cells.
+MAX_CACHED_CELLS = 8192
 
-  def _key(item):
-    topleft = item.bounding_rect.topleft
-    return topleft[axis]
 
-  return _key
+CacheStats = collections.namedtuple('CacheStats', ['hits', 'misses', 'cells'])
+
+
+def _bounding_rect(obstacle):
+  return obstacle.bounding_rect
+
+
+def _indexed_rect(obstacle):
+  # Snowflakes land on the snow too, so it has to be inside the extents.
+  rect = getattr(obstacle, 'bounding_rect_with_snow', None)
+  if rect is None:
+    return obstacle.bounding_rect
+  return rect
+
+
+def _edges(rect):
+  return (rect.left, rect.top, rect.right, rect.bottom)
 
 
 # Heavily inspired by the example in https://en.wikipedia.org/wiki/K-d_tree.
 def obstacle_kd_tree(obstacles, depth=0):
+  """Builds a kd-tree of obstacles, split on their top-left corners.
+
+  The obstacles are sorted along x and along y once. Then the tree is built
+  a level at a time: every subtree on the level is split around its median
+  at once, with numpy, in a way that keeps both orders sorted. That makes
+  the build O(n log n) with no recursion, however big the level is."""
+  obstacles = list(obstacles)
   if not obstacles:
     return NullKdTree()
 
-  # There are two dimensions: x and y. Switch between them for the different layers of the tree
-  # to get a good partitioning.
-  axis = depth % 2
-  sorted_list = sorted(obstacles, key=_sort_by_axis(axis))
-  median = len(obstacles) // 2
+  corners = numpy.array([o.bounding_rect.topleft for o in obstacles])
+  ids = numpy.arange(len(obstacles))
+  # Ties on one axis go by the other axis, then by the order passed in.
+  by_axis = [numpy.lexsort((ids, corners[:, 1], corners[:, 0])),
+             numpy.lexsort((ids, corners[:, 0], corners[:, 1]))]
+
+  # The tree is laid out in preorder: a node's left subtree comes right
+  # after it, then its right subtree.
+  order = numpy.empty(len(obstacles), dtype=numpy.intp)
+  lefts = numpy.full(len(obstacles), -1, dtype=numpy.intp)
+  rights = numpy.full(len(obstacles), -1, dtype=numpy.intp)
+  # Per obstacle: left of its subtree's median (0), the median (1) or right
+  # of it (2), and which of the level's subtrees it's in.
+  side = numpy.empty(len(obstacles), dtype=numpy.intp)
+  subtree = numpy.empty(len(obstacles), dtype=numpy.intp)
+
+  # The subtrees on the current level, in the order they're laid out in
+  # by_axis, and the node each one starts at.
+  sizes = numpy.array([len(obstacles)])
+  nodes = numpy.array([0])
+  while len(sizes):
+    # There are two dimensions: x and y. Switch between them for the
+    # different layers of the tree to get a good partitioning.
+    split = by_axis[depth % 2]
+    starts = numpy.cumsum(sizes) - sizes
+    medians = sizes // 2
+    order[nodes] = split[starts + medians]
+
+    rank = numpy.arange(len(split)) - numpy.repeat(starts, sizes)
+    side[split] = numpy.sign(rank - numpy.repeat(medians, sizes)) + 1
+    subtree[split] = numpy.repeat(numpy.arange(len(sizes)), sizes)
+    # Drop the medians and move the rest into their child subtrees. The sort
+    # is stable, so both orders stay sorted.
+    for axis, sorted_ids in enumerate(by_axis):
+      sorted_ids = sorted_ids[side[sorted_ids] != 1]
+      child = 2 * subtree[sorted_ids] + side[sorted_ids] // 2
+      by_axis[axis] = sorted_ids[numpy.argsort(child, kind='stable')]
 
-  return ObstacleKdTree(sorted_list[median],
-                        obstacle_kd_tree(sorted_list[:median], depth + 1),
-                        obstacle_kd_tree(sorted_list[median + 1:], depth + 1))
+    child_sizes = numpy.column_stack((medians, sizes - medians - 1))
+    child_nodes = numpy.column_stack((nodes + 1, nodes + 1 + medians))
+    has_child = child_sizes > 0
+    lefts[nodes[has_child[:, 0]]] = child_nodes[has_child[:, 0], 0]
+    rights[nodes[has_child[:, 1]]] = child_nodes[has_child[:, 1], 1]
+    sizes = child_sizes[has_child]
+    nodes = child_nodes[has_child]
+    depth += 1
+
+  return ObstacleKdTree([obstacles[i] for i in order], lefts, rights)
 
 
 class ObstacleKdTree(object):
+  """A kd-tree of obstacles, split on their top-left corners.
+
+  Every node also knows the extent of its subtree: the smallest rect that
+  holds the indexed rects of all obstacles under it. An obstacle's indexed
+  rect is its bounding_rect_with_snow if it has one, else its bounding_rect.
+  Searches skip subtrees whose extent doesn't contain the point, so they
+  only visit the parts of the tree near it.
+
+  The nodes are kept in flat lists in preorder, so node i holds the i:th
+  obstacle of walk_preorder(). Build it with obstacle_kd_tree()."""
+
+  def __init__(self, obstacles, lefts, rights):
+    # Per node, in preorder: the obstacle, the nodes of its children (-1 if
+    # none) and its parent.
+    self._obstacles = obstacles
+    lefts = numpy.asarray(lefts, dtype=numpy.intp)
+    rights = numpy.asarray(rights, dtype=numpy.intp)
+    parents = numpy.full(len(obstacles), -1, dtype=numpy.intp)
+    # Number of obstacles in the tree.
+    self.size = len(obstacles)
+
+    # The nodes on each level of the tree, from the root down.
+    levels = []
+    level = numpy.arange(min(self.size, 1))
+    while len(level):
+      levels.append(level)
+      level = numpy.concatenate((lefts[level], rights[level]))
+      level = level[level >= 0]
 
-  def __init__(self, obstacle, left, right):
-    self.obstacle = obstacle
-    self.left = left
-    self.right = right
+    # Per node, (left, top, right, bottom) of the obstacle's indexed rect
+    # and of the subtree's extent.
+    rects = numpy.array([_edges(_indexed_rect(o)) for o in obstacles],
+                        dtype=numpy.int64).reshape(-1, 4)
+    extents = rects.copy()
+    # Fit a level at a time from the bottom up, so the children's extents
+    # are done when their parents' are computed.
+    for level in reversed(levels):
+      for children in (lefts[level], rights[level]):
+        parent = level[children >= 0]
+        child = children[children >= 0]
+        parents[child] = parent
+        extents[parent, :2] = numpy.minimum(extents[parent, :2],
+                                            extents[child, :2])
+        extents[parent, 2:] = numpy.maximum(extents[parent, 2:],
+                                            extents[child, 2:])
+
+    # Searches read these one node at a time, which is faster from lists.
+    self._lefts = lefts.tolist()
+    self._rights = rights.tolist()
+    self._parents = parents.tolist()
+    self._rects = list(map(tuple, rects.tolist()))
+    self._extents = list(map(tuple, extents.tolist()))
+    # Only filled in when first asked to refit.
+    self._nodes_by_obstacle = None
+    # Cell -> the nodes whose indexed rect overlaps it, in preorder.
+    self._cells = {}
+    self._cache_hits = 0
+    self._cache_misses = 0
 
   def __repr__(self):
-    return pprint.pformat(tuple(self))
+    return pprint.pformat(self._obstacles)
+
+  def _fit(self, node):
+    """Recomputes a node's extent from its obstacle and children.
+
+    Returns True if the extent changed."""
+    left, top, right, bottom = self._rects[node]
+    for child in (self._lefts[node], self._rights[node]):
+      if child >= 0:
+        child_left, child_top, child_right, child_bottom = self._extents[child]
+        left = min(left, child_left)
+        top = min(top, child_top)
+        right = max(right, child_right)
+        bottom = max(bottom, child_bottom)
+
+    extent = (left, top, right, bottom)
+    if extent == self._extents[node]:
+      return False
+    self._extents[node] = extent
+    return True
+
+  def refit(self, obstacle):
+    """Updates the tree after obstacle's indexed rect changed.
+
+    Call this e.g. when snow lands on the obstacle. The extents on the path
+    up from the obstacle are recomputed exactly."""
+    if self._nodes_by_obstacle is None:
+      self._nodes_by_obstacle = {id(o): node
+                                 for node, o in enumerate(self._obstacles)}
+    node = self._nodes_by_obstacle[id(obstacle)]
+    old_rect = self._rects[node]
+    new_rect = _edges(_indexed_rect(obstacle))
+    if new_rect == old_rect:
+      return
+    self._rects[node] = new_rect
+    self._forget_cells(old_rect)
+    self._forget_cells(new_rect)
+    while node >= 0 and self._fit(node):
+      node = self._parents[node]
 
   def search(self, pos):
-    return self._search(pos, depth=0)
+    """Returns the obstacles whose indexed rect contains pos, in preorder."""
+    return tuple(self.search_into(pos, []))
 
   def quick_search(self, pos):
-    # Implementation note: quantize the position to improve the hit rate for
-    # the memoizing lru cache. The returned results could miss some obstacles
-    # if they're just outside the step, so use where we don't need 100%
-    # precision.
-    step = 20
-    x, y = pos
-    quantized_pos = (x // step * step, y // step * step)
-    return self._memoized_search(quantized_pos)
-
-  @functools.lru_cache(maxsize=2048)
-  def _memoized_search(self, pos):
-    return self._search(pos, depth=0)
-
-  def _search(self, pos, depth):
-    axis = depth % 2
-    current = self.obstacle.bounding_rect.topleft
-
-    if pos[axis] < current[axis]:
-      return self.left._search(pos, depth + 1)
+    """Same as search(), but remembers which obstacles are near pos.
+
+    Each CELL_SIZE square cell caches the obstacles overlapping it, so
+    searching near the same place again skips the tree walk. refit() drops
+    the cells the obstacle's rect was or is in."""
+    # Rect.collidepoint truncates coordinates toward zero, so do that too.
+    x, y = int(pos[0]), int(pos[1])
+    cell = (x // CELL_SIZE, y // CELL_SIZE)
+    nodes = self._cells.get(cell)
+    if nodes is None:
+      self._cache_misses += 1
+      if len(self._cells) >= MAX_CACHED_CELLS:
+        self._cells.clear()
+      nodes = self._cells[cell] = self._overlapping(
+          cell[0] * CELL_SIZE, cell[1] * CELL_SIZE,
+          (cell[0] + 1) * CELL_SIZE, (cell[1] + 1) * CELL_SIZE)
     else:
-      return ((self.obstacle,) +
-              self.left._search(pos, depth + 1) +
-              self.right._search(pos, depth + 1))
+      self._cache_hits += 1
 
-  def walk_preorder(self):
-    yield self.obstacle
-    for obstacle in self.left.walk_preorder():
-      yield obstacle
-    for obstacle in self.right.walk_preorder():
-      yield obstacle
+    rects = self._rects
+    found = []
+    for node in nodes:
+      left, top, right, bottom = rects[node]
+      if left <= x < right and top <= y < bottom:
+        found.append(self._obstacles[node])
+    return tuple(found)
 
+  def query_rect(self, rect):
+    """Returns the obstacles whose indexed rect overlaps rect, in preorder."""
+    return tuple(self._obstacles[node] for node in self._overlapping(
+        rect.left, rect.top, rect.right, rect.bottom))
 
-class NullKdTree(ObstacleKdTree):
+  def cache_stats(self):
+    """Returns the hits, misses and cached cells of quick_search()."""
+    return CacheStats(self._cache_hits, self._cache_misses, len(self._cells))
 
-  def __init__(self):
-    super().__init__(None, None, None)
+  def _overlapping(self, left, top, right, bottom):
+    """Returns the nodes whose indexed rect overlaps a rect, in preorder."""
+    extents = self._extents
+    rects = self._rects
+    nodes = []
+    to_visit = [0] if self.size else []
+    while to_visit:
+      node = to_visit.pop()
+      min_x, min_y, max_x, max_y = extents[node]
+      if min_x >= right or max_x <= left or min_y >= bottom or max_y <= top:
+        continue
+      min_x, min_y, max_x, max_y = rects[node]
+      if min_x < right and max_x > left and min_y < bottom and max_y > top:
+        nodes.append(node)
+      # Right goes first so left comes off the stack first: preorder.
+      if self._rights[node] >= 0:
+        to_visit.append(self._rights[node])
+      if self._lefts[node] >= 0:
+        to_visit.append(self._lefts[node])
+    return tuple(nodes)
+
+  def _forget_cells(self, rect):
+    left, top, right, bottom = rect
+    xs = range(left // CELL_SIZE, (right - 1) // CELL_SIZE + 1)
+    ys = range(top // CELL_SIZE, (bottom - 1) // CELL_SIZE + 1)
+    if len(xs) * len(ys) > len(self._cells):
+      # Cheaper to look through the cache than through the rect.
+      for cell in [cell for cell in self._cells
+                   if cell[0] in xs and cell[1] in ys]:
+        del self._cells[cell]
+    else:
+      for cx in xs:
+        for cy in ys:
+          self._cells.pop((cx, cy), None)
+
+  def search_into(self, pos, out):
+    """Like search(), but appends the obstacles to the list out.
+
+    Lets callers that search a lot reuse one list. Returns out."""
+    # Rect.collidepoint truncates coordinates toward zero, so do that too.
+    x, y = int(pos[0]), int(pos[1])
+    extents = self._extents
+    rects = self._rects
+    lefts = self._lefts
+    rights = self._rights
+    to_visit = [0] if self.size else []
+    while to_visit:
+      node = to_visit.pop()
+      left, top, right, bottom = extents[node]
+      if not left <= x < right or not top <= y < bottom:
+        continue
+      left, top, right, bottom = rects[node]
+      if left <= x < right and top <= y < bottom:
+        out.append(self._obstacles[node])
+      # Right goes first so left comes off the stack first: preorder.
+      if rights[node] >= 0:
+        to_visit.append(rights[node])
+      if lefts[node] >= 0:
+        to_visit.append(lefts[node])
+    return out
+
+  def query_points(self, xs, ys, hit_rect=_bounding_rect):
+    """Finds the obstacle hit by each point in a batch.
 
-  def _search(self, pos, depth):
-    return ()
+    xs and ys can be anything numpy can read, like arrays or buffers.
+    Returns an array holding, for each point, the walk_preorder() index of
+    the first obstacle whose hit_rect contains the point, or -1 if it hits
+    nothing. hit_rect must return rects inside the obstacles' indexed rects,
+    or points outside those are missed. The tree is walked once for the
+    whole batch."""
+    # Rect.collidepoint truncates coordinates toward zero, so do that too.
+    px = numpy.asarray(xs).astype(numpy.int64)
+    py = numpy.asarray(ys).astype(numpy.int64)
+    hits = numpy.full(len(px), -1, dtype=numpy.intp)
+
+    # Visit nodes in preorder so the first hit in preorder wins.
+    to_visit = [(0, numpy.arange(len(px)))] if self.size else []
+    while to_visit:
+      node, candidates = to_visit.pop()
+      # Points that hit something earlier in preorder are done.
+      candidates = candidates[hits[candidates] < 0]
+      if not len(candidates):
+        continue
+      cx = px[candidates]
+      cy = py[candidates]
+      left, top, right, bottom = self._extents[node]
+      in_extent = (cx >= left) & (cx < right) & (cy >= top) & (cy < bottom)
+      candidates = candidates[in_extent]
+      cx = cx[in_extent]
+      cy = cy[in_extent]
+
+      rect = hit_rect(self._obstacles[node])
+      inside = ((cx >= rect.left) & (cx < rect.right) &
+                (cy >= rect.top) & (cy < rect.bottom))
+      # Nodes are numbered in preorder.
+      hits[candidates[inside]] = node
+
+      missed = candidates[~inside]
+      if self._rights[node] >= 0:
+        to_visit.append((self._rights[node], missed))
+      if self._lefts[node] >= 0:
+        to_visit.append((self._lefts[node], missed))
+
+    return hits
 
   def walk_preorder(self):
-    return ()
+    return iter(self._obstacles)
+
+
+class NullKdTree(ObstacleKdTree):
+
+  def __init__(self):
+    super().__init__([], [], [])
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import pygame
+import random
 import unittest
 
 import kdtree
@@ -91,10 +92,175 @@ class ObstacleKdTreeTest(unittest.TestCase):
   def test_search_culls_rects_left_and_above_2(self):
     obstacles = (obstacle(100, 100), obstacle(50, 100), obstacle(200, 100))
     tree = kdtree.obstacle_kd_tree(obstacles)
-    hits = tree.search((0, 101))
+    hits = tree.search((55, 101))
     result = [o.bounding_rect.topleft for o in hits]
     self.assertEqual(result, [(50, 100)])
 
+  def test_search_only_returns_obstacles_containing_point(self):
+    obstacles = (obstacle(100, 100), obstacle(50, 100), obstacle(200, 100),
+                 obstacle(105, 105))
+    tree = kdtree.obstacle_kd_tree(obstacles)
+
+    self.assertEqual(tree.search((0, 101)), ())
+    self.assertEqual(set(tree.search((107, 107))),
+                     {obstacles[0], obstacles[3]})
+
+  def test_search_into_appends_to_buffer(self):
+    obstacles = (obstacle(100, 100), obstacle(50, 100))
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    out = ['already there']
+
+    result = tree.search_into((55, 101), out)
+
+    self.assertIs(result, out)
+    self.assertEqual(out, ['already there', obstacles[1]])
+
+  def test_refit_after_obstacle_grows(self):
+    obstacles = [obstacle(x, 100) for x in range(0, 200, 20)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    self.assertEqual(tree.search((45, 50)), ())
+
+    # Like snow piling up on top of it.
+    obstacles[2].bounding_rect.height += 60
+    obstacles[2].bounding_rect.y -= 60
+    tree.refit(obstacles[2])
+
+    self.assertEqual(tree.search((45, 50)), (obstacles[2],))
+    self.assertEqual(list(tree.query_points([45], [50])),
+                     [list(tree.walk_preorder()).index(obstacles[2])])
+
+  def test_query_points_returns_preorder_index_of_hit(self):
+    obstacles = (obstacle(100, 100), obstacle(50, 100), obstacle(200, 100))
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    preorder = list(tree.walk_preorder())
+
+    hits = tree.query_points([55, 205, 0, 105], [105, 101, 0, 109])
+
+    self.assertEqual(list(hits), [preorder.index(obstacles[1]),
+                                  preorder.index(obstacles[2]), -1,
+                                  preorder.index(obstacles[0])])
+
+  def test_query_points_agrees_with_search(self):
+    random.seed(0)
+    obstacles = [obstacle(random.randint(0, 500), random.randint(0, 500),
+                          width=random.randint(5, 80),
+                          height=random.randint(5, 80)) for _ in range(50)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    preorder = list(tree.walk_preorder())
+    points = [(random.uniform(0, 600), random.uniform(0, 600))
+              for _ in range(500)]
+
+    xs, ys = zip(*points)
+    hits = tree.query_points(xs, ys)
+
+    for point, hit in zip(points, hits):
+      expected = -1
+      for candidate in tree.search(point):
+        if candidate.bounding_rect.collidepoint(point):
+          expected = preorder.index(candidate)
+          break
+      self.assertEqual(hit, expected, msg='for point %s' % (point,))
+
+  def test_refit_after_obstacle_moves_far(self):
+    random.seed(1)
+    obstacles = [obstacle(random.randint(0, 500), random.randint(0, 500))
+                 for _ in range(30)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    moved = obstacles[7]
+    old_pos = moved.bounding_rect.center
+
+    moved.bounding_rect.topleft = (2000, -300)
+    tree.refit(moved)
+
+    self.assertNotIn(moved, tree.search(old_pos))
+    self.assertEqual(tree.search((2005, -295)), (moved,))
+
+  def test_query_points_on_empty_tree(self):
+    tree = kdtree.obstacle_kd_tree([])
+    self.assertEqual(list(tree.query_points([1, 2], [3, 4])), [-1, -1])
+
+  def test_build_matches_sorting_at_every_level(self):
+    def sorted_build(items, depth):
+      # The textbook build: sort by the axis at every level.
+      if not items:
+        return []
+      items = sorted(items, key=lambda o: o.bounding_rect.topleft[depth % 2])
+      median = len(items) // 2
+      return ([items[median]] + sorted_build(items[:median], depth + 1) +
+              sorted_build(items[median + 1:], depth + 1))
+
+    # No ties on either axis, since the two builds break those differently.
+    random.seed(2)
+    xs = random.sample(range(1000), 300)
+    ys = random.sample(range(1000), 300)
+    obstacles = [obstacle(x, y) for x, y in zip(xs, ys)]
+
+    tree = kdtree.obstacle_kd_tree(obstacles)
+
+    self.assertEqual(list(tree.walk_preorder()), sorted_build(obstacles, 0))
+
+  def test_build_with_many_identical_obstacles(self):
+    obstacles = [obstacle(10, 10) for _ in range(1000)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+
+    self.assertEqual(tree.size, 1000)
+    self.assertEqual(tree.search((15, 15)), tuple(tree.walk_preorder()))
+    self.assertEqual(set(tree.walk_preorder()), set(obstacles))
+
+  def test_quick_search_agrees_with_search(self):
+    random.seed(3)
+    obstacles = [obstacle(random.randint(-50, 500), random.randint(-50, 500),
+                          width=random.randint(1, 60),
+                          height=random.randint(1, 60)) for _ in range(60)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    # Plenty of points near cell edges, and each cell is asked twice.
+    points = [(random.randint(-3, 30) * kdtree.CELL_SIZE + random.choice(
+                  (-1.5, -0.5, 0, 0.5, 19.5)),
+               random.uniform(-60, 600)) for _ in range(1000)]
+
+    for point in points + points:
+      self.assertEqual(tree.quick_search(point), tree.search(point),
+                       msg='for point %s' % (point,))
+    self.assertGreater(tree.cache_stats().hits, 0)
+
+  def test_quick_search_sees_refit_obstacles(self):
+    obstacles = [obstacle(0, 100), obstacle(100, 100)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    self.assertEqual(tree.quick_search((5, 85)), ())
+
+    obstacles[0].bounding_rect.y -= 20
+    obstacles[0].bounding_rect.height += 20
+    tree.refit(obstacles[0])
+
+    self.assertEqual(tree.quick_search((5, 85)), (obstacles[0],))
+
+  def test_cache_stats_are_per_tree(self):
+    tree = kdtree.obstacle_kd_tree([obstacle(0, 0)])
+    other_tree = kdtree.obstacle_kd_tree([obstacle(0, 0)])
+
+    tree.quick_search((5, 5))
+    tree.quick_search((6, 6))
+    tree.quick_search((45, 5))
+
+    self.assertEqual(tree.cache_stats(),
+                     kdtree.CacheStats(hits=1, misses=2, cells=2))
+    self.assertEqual(other_tree.cache_stats(),
+                     kdtree.CacheStats(hits=0, misses=0, cells=0))
+
+  def test_query_rect_finds_overlapping_obstacles_in_preorder(self):
+    random.seed(5)
+    obstacles = [obstacle(random.randint(0, 500), random.randint(0, 500),
+                          width=random.randint(1, 80),
+                          height=random.randint(1, 80)) for _ in range(100)]
+    tree = kdtree.obstacle_kd_tree(obstacles)
+    preorder = list(tree.walk_preorder())
+
+    for _ in range(100):
+      rect = pygame.Rect(random.randint(-20, 600), random.randint(-20, 600),
+                         random.randint(1, 200), random.randint(1, 200))
+      expected = tuple(o for o in preorder if o.bounding_rect.colliderect(rect))
+      self.assertEqual(tree.query_rect(rect), expected, msg='for %s' % rect)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -17,12 +17,28 @@ import pygame
 import sys
 
 import game_loop
+import simulation
 
 
 def parse_args():
   parser = argparse.ArgumentParser()
   parser.add_argument('-s', '--start_hidden', action='store_true',
                       help='hide the game on start', required=False)
+  parser.add_argument('--spatial_index',
+                      choices=sorted(simulation.SPATIAL_INDEXES),
+                      default='kdtree',
+                      help='how to look up obstacles', required=False)
+  parser.add_argument('--snow_workers', type=int, default=1,
+                      help='processes to move snow in', required=False)
+  parser.add_argument('--threaded', action='store_true',
+                      help='run the simulation on its own thread',
+                      required=False)
+  parser.add_argument('--dirty_rects', action='store_true',
+                      help='only update the parts of the display that changed',
+                      required=False)
+  parser.add_argument('--trace', metavar='PATH', default=None,
+                      help='record a Chrome trace to PATH (F9 writes it)',
+                      required=False)
   return parser.parse_args()
 
 
@@ -31,7 +47,10 @@ def main():
   pygame.display.set_caption('Platform Game')
 
   args = parse_args()
-  game_loop.demo(args.start_hidden)
+  game_loop.demo(args.start_hidden,
+                 simulation.SPATIAL_INDEXES[args.spatial_index],
+                 args.snow_workers, args.trace, args.threaded,
+                 args.dirty_rects)
 
 if __name__ == '__main__':
   sys.exit(main())
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import functools
 import os
 import pygame
@@ -22,18 +23,51 @@ import snow
 import world
 
 
+class _RectWithSnow(object):
+  """Caches the union of an obstacle's rect and its snowpile's bounds.
+
+  Snowflakes ask for this a lot, and it only changes when the obstacle
+  moves or the snowpile's bounds change."""
+
+  def __init__(self):
+    self._rect = None
+    self._snow_bounds_version = None
+    self._union = None
+
+  def get(self, rect, snowpile):
+    if (rect is not self._rect or
+        snowpile.bounds_version != self._snow_bounds_version):
+      self._rect = rect
+      self._snow_bounds_version = snowpile.bounds_version
+      self._union = rect.union(snowpile.bounding_rect)
+    return self._union
+
+
 class Box(world.Thing):
 
   def __init__(self, rect, color):
     self._rect = rect
     self._color = color
     self._snowpile = snow.spawn_snowpile(spawned_on=rect)
+    self._rect_with_snow = _RectWithSnow()
 
   def draw(self, screen, viewpoint_pos):
     draw_pos = self._rect.move(-viewpoint_pos)
     pygame.draw.rect(screen, self._color, draw_pos, 0)
     self._snowpile.draw(screen, viewpoint_pos)
 
+  def mark_dirty(self, region, viewpoint_pos):
+    # Boxes that stand still only change where snow piles up.
+    if self.is_kinematic:
+      region.add_rect(self._rect.move(-viewpoint_pos))
+    self._snowpile.mark_dirty(region, viewpoint_pos)
+
+  def snapshot(self):
+    frozen = copy.copy(self)
+    frozen._rect = pygame.Rect(self._rect)
+    frozen._snowpile = self._snowpile.snapshot()
+    return frozen
+
   def move_or_resize(self, new_rect):
     self._rect = new_rect
     snow.move_snowpile(self._snowpile, spawned_on=self._rect)
@@ -48,7 +82,28 @@ class Box(world.Thing):
 
   @property
   def bounding_rect_with_snow(self):
-    return self._rect.union(self._snowpile.bounding_rect)
+    return self._rect_with_snow.get(self._rect, self._snowpile)
+
+
+class MovingBox(Box):
+  """A box that slides back and forth sideways on its own."""
+
+  def __init__(self, rect, color, travel, speed=1):
+    super().__init__(rect, color)
+    self._start_x = rect.x
+    self._travel = travel
+    self._speed = speed
+
+  @property
+  def is_kinematic(self):
+    return True
+
+  def update(self):
+    new_rect = self._rect.move(self._speed, 0)
+    if not self._start_x <= new_rect.x <= self._start_x + self._travel:
+      self._speed = -self._speed
+      new_rect = self._rect.move(self._speed, 0)
+    self.move_or_resize(new_rect)
 
 
 class Ground(world.Thing):
@@ -64,10 +119,17 @@ class Ground(world.Thing):
     self._snowpile = snow.spawn_snowpile(pygame.Rect(0, y, 5000, 1))
     # Don't try to spawn snowflakes off the ground snowpile.
     self._snowpile.emit_snowflakes = False
+    # Make the ground be very thick and basically infinite in both directions.
+    self._bounding_rect = pygame.Rect(-10000000, self._pos.y, 200000000, 10000)
+    self._rect_with_snow = _RectWithSnow()
 
   def load(self, image_path):
     loaded_image = pygame.image.load(image_path)
-    self._image = loaded_image.convert()
+    # Without a display (e.g. when running headless) there's no pixel
+    # format to convert to, but then we won't be drawing either.
+    if pygame.display.get_init() and pygame.display.get_surface():
+      loaded_image = loaded_image.convert()
+    self._image = loaded_image
 
   def draw(self, screen, viewpoint_pos):
     assert self._image
@@ -80,14 +142,22 @@ class Ground(world.Thing):
       draw_pos.x += self._image.get_width()
     self._snowpile.draw(screen, viewpoint_pos)
 
+  def mark_dirty(self, region, viewpoint_pos):
+    self._snowpile.mark_dirty(region, viewpoint_pos)
+
+  def snapshot(self):
+    frozen = copy.copy(self)
+    frozen._pos = pygame.math.Vector2(self._pos)
+    frozen._snowpile = self._snowpile.snapshot()
+    return frozen
+
   @property
   def bounding_rect(self):
-    # Make the ground be very thick and basically infinite in both directions.
-    return pygame.Rect(-10000000, self._pos.y, 200000000, 10000)
+    return self._bounding_rect
 
   @property
   def bounding_rect_with_snow(self):
-    return self.bounding_rect.union(self._snowpile.bounding_rect)
+    return self._rect_with_snow.get(self._bounding_rect, self._snowpile)
 
   @property
   def snowpile(self):
@@ -107,6 +177,12 @@ def random_obstacle(bounds):
   return Box(rect, color)
 
 
+def random_moving_obstacle(bounds):
+  box = random_obstacle(bounds)
+  color = pygame.Color(128, 128, 192)
+  return MovingBox(box.bounding_rect, color, travel=random.randint(50, 200))
+
+
 def load_ground(y, initial_viewpoint_pos):
   ground = Ground(y, initial_viewpoint_pos)
   ground.load(resources.image_path('snow.jpg'))
@@ -33,6 +33,46 @@ class ObstaclesTest(unittest.TestCase):
     self.assertTrue(bound.collidepoint(0, 9999))
     self.assertFalse(bound.collidepoint(10000, -1))
 
+  def testBoxBoundsWithSnowFollowSnowAndMoves(self):
+    box = obstacles.Box(pygame.Rect(10, 100, 20, 20), pygame.Color(0, 0, 0))
+    self.assertIs(box.bounding_rect_with_snow, box.bounding_rect_with_snow)
+    self.assertEqual(box.bounding_rect_with_snow.bottom, 120)
+
+    box.snowpile.add_many(xs=[11] * 40, ys=[99] * 40)
+    self.assertEqual(box.bounding_rect_with_snow,
+                     box.bounding_rect.union(box.snowpile.bounding_rect))
+
+    box.move_or_resize(pygame.Rect(50, 50, 20, 20))
+    self.assertEqual(box.bounding_rect_with_snow.bottomright, (70, 70))
+
+  def testMovingBoxGoesBackAndForth(self):
+    box = obstacles.MovingBox(pygame.Rect(10, 100, 20, 20),
+                              pygame.Color(0, 0, 0), travel=2)
+    self.assertTrue(box.is_kinematic)
+
+    xs = []
+    for _ in range(6):
+      box.update()
+      xs.append(box.bounding_rect.x)
+
+    self.assertEqual(xs, [11, 12, 11, 10, 11, 12])
+    self.assertEqual(box.snowpile.bounding_rect.bottomleft, (12, 100))
+
+  def testBoxSnapshotDrawsLikeTheBoxDid(self):
+    box = obstacles.Box(pygame.Rect(10, 100, 20, 20), pygame.Color(0, 0, 255))
+    box.snowpile.add_many(xs=[11] * 40, ys=[99] * 40)
+    before = pygame.Surface((100, 200))
+    box.draw(before, pygame.math.Vector2(0, 0))
+
+    frozen = box.snapshot()
+    box.move_or_resize(pygame.Rect(50, 50, 20, 20))
+    box.snowpile.add_many(xs=[51] * 40, ys=[49] * 40)
+    after = pygame.Surface((100, 200))
+    frozen.draw(after, pygame.math.Vector2(0, 0))
+
+    self.assertEqual(pygame.image.tostring(before, 'RGB'),
+                     pygame.image.tostring(after, 'RGB'))
+
 
 pygame.init()
 size = (640, 480)
@@ -0,0 +1,268 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+import signal
+import weakref
+
+import snow
+
+
+# Below this many flakes per worker, talking to the workers costs more than
+# it saves; step the strips in this process instead.
+MIN_FLAKES_PER_WORKER = 20000
+
+# Workers bucket their strip's obstacles into square cells this big, so a
+# flake is only tested against the obstacles in its own cell.
+CELL_SIZE = 64
+
+# Shared memory blocks the current worker process has attached to, by name.
+_attached_blocks = {}
+
+
+def _attach(*names):
+  """Returns the named shared memory blocks, attaching to new ones.
+
+  Every task names the blocks in use right now, so any other block this
+  process is still attached to has been replaced; those are closed."""
+  for name in list(_attached_blocks):
+    if name not in names:
+      _attached_blocks.pop(name).close()
+  for name in names:
+    if name not in _attached_blocks:
+      _attached_blocks[name] = shared_memory.SharedMemory(name=name)
+  return [_attached_blocks[name] for name in names]
+
+
+def _step_strip(positions, hits, dx, dy, rects, indices):
+  """Moves a strip's flakes and finds the first obstacle each one hits.
+
+  positions is the strip's (n, 2) slice of the flake buffer and is moved
+  in place. rects holds (left, top, right, bottom) for each obstacle that
+  overlaps the strip, with its walk_preorder() index in indices (sorted).
+  The index of the first obstacle containing each flake goes into hits."""
+  positions += (dx, dy)
+  # Rect.collidepoint truncates coordinates toward zero, so do that too.
+  xs = positions[:, 0].astype(numpy.int64)
+  ys = positions[:, 1].astype(numpy.int64)
+  found = _first_rect_hits(xs, ys, rects)
+  hits[:] = -1
+  hit = found >= 0
+  hits[hit] = indices[found[hit]]
+
+
+def _first_rect_hits(xs, ys, rects):
+  """Returns the index of the first rect containing each point, or -1.
+
+  The rects are bucketed into a grid of CELL_SIZE cells first, so each
+  point is only tested against the rects in its own cell."""
+  found = numpy.full(len(xs), -1, dtype=numpy.intp)
+  if not len(xs) or not len(rects):
+    return found
+  cell_xs = xs // CELL_SIZE
+  cell_ys = ys // CELL_SIZE
+  # Only cells with points in them matter, so clip the rects to those.
+  min_x, max_x = cell_xs.min(), cell_xs.max()
+  min_y, max_y = cell_ys.min(), cell_ys.max()
+  left, top, right, bottom = rects.T
+  first_x = numpy.maximum(left // CELL_SIZE, min_x)
+  first_y = numpy.maximum(top // CELL_SIZE, min_y)
+  widths = numpy.maximum(
+      numpy.minimum((right - 1) // CELL_SIZE, max_x) - first_x + 1, 0)
+  heights = numpy.maximum(
+      numpy.minimum((bottom - 1) // CELL_SIZE, max_y) - first_y + 1, 0)
+
+  # One entry per rect and cell it covers, in rect order.
+  sizes = widths * heights
+  owners = numpy.repeat(numpy.arange(len(rects)), sizes)
+  first_entries = numpy.cumsum(sizes) - sizes
+  offsets = numpy.arange(len(owners)) - numpy.repeat(first_entries, sizes)
+  rows = max_y - min_y + 1
+  entry_cells = ((first_x[owners] + offsets // heights[owners] - min_x) * rows +
+                 first_y[owners] + offsets % heights[owners] - min_y)
+  # The sort is stable, so each cell's rects stay in order and the first
+  # one containing a point is the first rect containing it.
+  by_cell = numpy.argsort(entry_cells, kind='stable')
+  entry_cells = entry_cells[by_cell]
+  owners = owners[by_cell]
+
+  point_cells = (cell_xs - min_x) * rows + cell_ys - min_y
+  starts = numpy.searchsorted(entry_cells, point_cells, side='left')
+  stops = numpy.searchsorted(entry_cells, point_cells, side='right')
+  for j in range((stops - starts).max(initial=0)):
+    todo = numpy.flatnonzero((starts + j < stops) & (found < 0))
+    candidates = owners[starts[todo] + j]
+    left, top, right, bottom = rects[candidates].T
+    x, y = xs[todo], ys[todo]
+    inside = (x >= left) & (x < right) & (y >= top) & (y < bottom)
+    found[todo[inside]] = candidates[inside]
+  return found
+
+
+def _init_worker():
+  # Workers are forked from a process that has usually started pygame, and
+  # SDL turns SIGTERM into a quit event. Workers need to die when the pool
+  # terminates them, though.
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _step_strip_in_worker(task):
+  positions_name, hits_name, start, stop, dx, dy, rects, indices = task
+  positions_block, hits_block = _attach(positions_name, hits_name)
+  positions = numpy.ndarray((stop, 2), dtype=numpy.float32,
+                            buffer=positions_block.buf)[start:]
+  hits = numpy.ndarray((stop,), dtype=numpy.intp, buffer=hits_block.buf)[start:]
+  _step_strip(positions, hits, dx, dy, rects, indices)
+  # Don't keep views into the blocks around; they'd stop them closing.
+  del positions, hits
+
+
+def _shut_down(pool, blocks):
+  if pool:
+    pool.terminate()
+  for block in blocks:
+    block.close()
+    block.unlink()
+
+
+class ParallelSnowfall(snow.Snowfall):
+  """Snowfall that steps its flakes in several worker processes.
+
+  The world is split into vertical strips, one per worker, with the edges
+  between them at quantiles of the flakes' x positions so each worker gets
+  about as many flakes as the others. Every tick the flakes are copied
+  into a shared memory buffer grouped by the strip they are in, and each
+  worker moves its strip's flakes and hit tests them against the obstacles
+  overlapping its strip. Flakes that crossed into a neighbouring strip
+  belong to that strip's worker from the next tick on.
+
+  All randomness stays in this process and hits resolve to the first
+  obstacle in walk_preorder() order, so a fixed seed gives the same world
+  whatever the number of workers."""
+
+  def __init__(self, workers, **kwargs):
+    super().__init__(**kwargs)
+    self.workers = workers
+    self._pool = None
+    self._capacity = 0
+    self._positions_block = None
+    self._hits_block = None
+    self._blocks = []
+    self._finalizer = None
+
+  def close(self):
+    if self._finalizer:
+      self._finalizer()
+    self._pool = None
+    self._capacity = 0
+    self._blocks = []
+    self._finalizer = None
+
+  def _move_snow_vectorized(self, obstacles, delta):
+    count = self._snowflakes.num_positions()
+    positions = self._snowflakes.xy_view()
+    strip_edges = self._strip_edges(positions[:, 0])
+
+    # Group the flakes by the strip they start the tick in.
+    strips = numpy.searchsorted(strip_edges, positions[:, 0], side='right')
+    order = numpy.argsort(strips, kind='stable')
+    strip_starts = numpy.searchsorted(strips[order],
+                                      numpy.arange(self.workers + 1))
+
+    rects, indices = _obstacle_rects(obstacles)
+    # Flakes can cross into a neighbouring strip during the step, so also
+    # test them against obstacles slightly outside their own strip.
+    margin = abs(delta.x) + 1
+    tasks = []
+    # The outermost strips own everything beyond the edges.
+    lefts = numpy.concatenate(([-numpy.inf], strip_edges - margin))
+    rights = numpy.concatenate((strip_edges + margin, [numpy.inf]))
+    for strip, (left, right) in enumerate(zip(lefts, rights)):
+      nearby = (rects[:, 2] > left) & (rects[:, 0] < right)
+      tasks.append((strip_starts[strip], strip_starts[strip + 1], delta.x,
+                    delta.y, rects[nearby], indices[nearby]))
+
+    if count < MIN_FLAKES_PER_WORKER * self.workers:
+      grouped_positions = positions[order]
+      grouped_hits = numpy.empty(count, dtype=numpy.intp)
+      for start, stop, dx, dy, strip_rects, strip_indices in tasks:
+        _step_strip(grouped_positions[start:stop], grouped_hits[start:stop],
+                    dx, dy, strip_rects, strip_indices)
+    else:
+      grouped_positions, grouped_hits = self._shared_buffers(count)
+      grouped_positions[:] = positions[order]
+      self._start_pool().map(
+          _step_strip_in_worker,
+          [(self._positions_block.name, self._hits_block.name) + task
+           for task in tasks])
+
+    # Put everything back in pool order.
+    positions[order] = grouped_positions
+    hits = numpy.empty(count, dtype=numpy.intp)
+    hits[order] = grouped_hits
+    del positions, grouped_positions, grouped_hits
+    with self.timers.time('land flakes'):
+      self._land_flakes(obstacles, hits)
+
+  def _strip_edges(self, xs):
+    """Returns the x positions where one strip ends and the next begins."""
+    if not len(xs):
+      return numpy.zeros(self.workers - 1)
+    return numpy.quantile(xs, numpy.arange(1, self.workers) / self.workers)
+
+  def _start_pool(self):
+    if not self._pool:
+      self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker)
+      self._reset_finalizer()
+    return self._pool
+
+  def _shared_buffers(self, count):
+    if count > self._capacity:
+      # Grow geometrically so we don't reallocate every tick while the
+      # snowfall is building up.
+      capacity = max(count, self._capacity * 2)
+      old_blocks = self._blocks
+      self._positions_block = shared_memory.SharedMemory(
+          create=True, size=capacity * 2 * numpy.dtype(numpy.float32).itemsize)
+      self._hits_block = shared_memory.SharedMemory(
+          create=True, size=capacity * numpy.dtype(numpy.intp).itemsize)
+      self._blocks = [self._positions_block, self._hits_block]
+      self._capacity = capacity
+      self._reset_finalizer()
+      for block in old_blocks:
+        block.close()
+        block.unlink()
+
+    positions = numpy.ndarray((count, 2), dtype=numpy.float32,
+                              buffer=self._positions_block.buf)
+    hits = numpy.ndarray((count,), dtype=numpy.intp,
+                         buffer=self._hits_block.buf)
+    return positions, hits
+
+  def _reset_finalizer(self):
+    # Make sure the workers and shared memory go away with us, or at exit.
+    if self._finalizer:
+      self._finalizer.detach()
+    self._finalizer = weakref.finalize(self, _shut_down, self._pool,
+                                       list(self._blocks))
+
+
+def _obstacle_rects(obstacles):
+  rects = [obstacle.bounding_rect_with_snow
+           for obstacle in obstacles.walk_preorder()]
+  as_array = numpy.array([(r.left, r.top, r.right, r.bottom) for r in rects],
+                         dtype=numpy.int64).reshape(-1, 4)
+  return as_array, numpy.arange(len(rects))
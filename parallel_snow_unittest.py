@@ -0,0 +1,148 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from multiprocessing import shared_memory
+import numpy
+import pygame
+import random
+import unittest
+
+import kdtree
+import obstacles
+import parallel_snow
+import snow
+import winds
+
+
+def make_obstacles():
+  color = pygame.Color(255, 255, 255)
+  boxes = [obstacles.Box(pygame.Rect(x, y, 40, 20), color)
+           for x, y in ((100, 300), (180, 250), (320, 310), (500, 200),
+                        (590, 330))]
+  return kdtree.obstacle_kd_tree(boxes)
+
+
+def run_snowfall(snowfall, ticks):
+  random.seed(0)
+  snow.Snowfall.reset_snowflake_angle()
+  level = make_obstacles()
+  for _ in range(ticks):
+    snowfall.spawn_snowflakes()
+    snowfall.move_snow(level, winds.NullWind())
+  heights = [obstacle.snowpile._snow_heights.tolist()
+             for obstacle in level.walk_preorder()]
+  return snowfall.snowflakes.xy_view().copy(), heights
+
+
+class ParallelSnowTest(unittest.TestCase):
+
+  def setUp(self):
+    self.bounds = pygame.Rect(0, -480, 640, 1440)
+    angle = (snow.Snowfall._snowflake_progress, snow.Snowfall._progress_delta,
+             snow.Snowfall.speed)
+    self.addCleanup(self._restore_angle, *angle)
+
+  def _restore_angle(self, progress, progress_delta, speed):
+    snow.Snowfall._snowflake_progress = progress
+    snow.Snowfall._progress_delta = progress_delta
+    snow.Snowfall.speed = speed
+
+  def test_same_result_as_serial_snowfall(self):
+    serial = run_snowfall(snow.Snowfall(world_bounds=self.bounds), ticks=60)
+    parallel = run_snowfall(
+        parallel_snow.ParallelSnowfall(3, world_bounds=self.bounds), ticks=60)
+
+    numpy.testing.assert_array_equal(serial[0], parallel[0])
+    self.assertEqual(serial[1], parallel[1])
+
+  def test_same_result_in_worker_processes(self):
+    in_process = run_snowfall(
+        parallel_snow.ParallelSnowfall(2, world_bounds=self.bounds), ticks=40)
+    in_workers = parallel_snow.ParallelSnowfall(2, world_bounds=self.bounds)
+    self.addCleanup(in_workers.close)
+    original_min_flakes = parallel_snow.MIN_FLAKES_PER_WORKER
+    parallel_snow.MIN_FLAKES_PER_WORKER = 0
+    try:
+      result = run_snowfall(in_workers, ticks=40)
+    finally:
+      parallel_snow.MIN_FLAKES_PER_WORKER = original_min_flakes
+
+    numpy.testing.assert_array_equal(in_process[0], result[0])
+    self.assertEqual(in_process[1], result[1])
+
+  def test_flakes_land_on_obstacles_in_the_next_strip(self):
+    snowfall = parallel_snow.ParallelSnowfall(2, world_bounds=self.bounds)
+    snow.Snowfall.speed = pygame.math.Vector2(2, 2)
+    # The strips meet halfway between the flakes, at x = 320, where the
+    # third box starts.
+    snowfall.snowflakes.append(319, 309)
+    snowfall.snowflakes.append(321, 0)
+
+    snowfall.move_snow(make_obstacles(), winds.NullWind())
+
+    self.assertEqual([(323, 2)], list(snowfall.snowflakes.all_positions))
+
+  def test_strip_hits_are_the_first_overlapping_obstacle(self):
+    rng = numpy.random.RandomState(0)
+    lefts = rng.randint(-200, 600, size=200)
+    tops = rng.randint(-200, 600, size=200)
+    rects = numpy.column_stack((lefts, tops, lefts + rng.randint(1, 150, 200),
+                                tops + rng.randint(1, 150, 200)))
+    # And one big one covering most of the others, like the ground.
+    rects = numpy.vstack((rects, [(-300, -300, 900, 900)]))
+    indices = numpy.arange(len(rects)) * 2
+    positions = rng.uniform(-400, 1000, size=(5000, 2)).astype(numpy.float32)
+    hits = numpy.empty(len(positions), dtype=numpy.intp)
+
+    parallel_snow._step_strip(positions, hits, 0, 0, rects, indices)
+
+    expected = []
+    for x, y in positions.astype(numpy.int64).tolist():
+      expected.append(next(
+          (index for (left, top, right, bottom), index in zip(rects, indices)
+           if left <= x < right and top <= y < bottom), -1))
+    numpy.testing.assert_array_equal(expected, hits)
+
+  def test_workers_close_blocks_that_were_replaced(self):
+    def step_in_new_blocks():
+      positions = shared_memory.SharedMemory(create=True, size=8)
+      hits = shared_memory.SharedMemory(create=True, size=8)
+      for block in (positions, hits):
+        self.addCleanup(block.unlink)
+        self.addCleanup(block.close)
+      parallel_snow._step_strip_in_worker(
+          (positions.name, hits.name, 0, 1, 0, 1,
+           numpy.zeros((0, 4), dtype=numpy.int64),
+           numpy.zeros(0, dtype=numpy.intp)))
+      return {positions.name, hits.name}
+
+    step_in_new_blocks()
+    names = step_in_new_blocks()
+    self.addCleanup(parallel_snow._attach)
+
+    self.assertEqual(names, set(parallel_snow._attached_blocks))
+
+  def test_strips_get_about_as_many_flakes_each(self):
+    snowfall = parallel_snow.ParallelSnowfall(4, world_bounds=self.bounds)
+    # Bunched up at one end of the world, like when the wind blows.
+    xs = numpy.random.RandomState(0).uniform(0, 100, size=1000)
+
+    edges = snowfall._strip_edges(xs)
+
+    strips = numpy.searchsorted(edges, xs, side='right')
+    self.assertEqual([250] * 4, numpy.bincount(strips).tolist())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import math
 import pygame
 
+import clocks
 import jump
 import speech_bubble
 import winds
@@ -26,13 +28,75 @@ def to_draw_coords(pos, viewpoint_pos):
   return pos - viewpoint_pos
 
 
+def _span(lo, delta, size):
+  # What [lo, lo + size) covers on its way to moving delta.
+  return (min(lo, lo + delta), max(lo, lo + delta) + size)
+
+
+def _overlaps(box, rect):
+  left, right, top, bottom = box
+  return (left < rect.right and right > rect.left and
+          top < rect.bottom and bottom > rect.top)
+
+
+def _sweep(lo, size, delta, cross_lo, cross_size, spans):
+  """Moves [lo, lo + size) by delta along an axis until it hits a span.
+
+  spans are (lo, hi, cross_lo, cross_hi) of the obstacles. Only those that
+  overlap [cross_lo, cross_lo + cross_size) on the other axis are in the
+  way. Returns how far it got and whether it hit something."""
+  hi = lo + size
+  cross_hi = cross_lo + cross_size
+  blocked = False
+  for span_lo, span_hi, span_cross_lo, span_cross_hi in spans:
+    if span_cross_lo >= cross_hi or span_cross_hi <= cross_lo:
+      continue
+    if delta > 0 and hi <= span_lo < hi + delta:
+      delta = span_lo - hi
+      blocked = True
+    elif delta < 0 and lo + delta < span_hi <= lo:
+      delta = span_hi - lo
+      blocked = True
+  return delta, blocked
+
+
+def _back_out(left, top, width, height, rect, speed):
+  """Moves a box that overlaps rect back along speed until it's out.
+
+  Returns the new top left. A box that isn't moving takes the shortest way
+  out instead."""
+  if not _overlaps((left, left + width, top, top + height), rect):
+    return left, top
+
+  # How much of a step back clears rect on each axis.
+  steps = []
+  if speed.x > 0:
+    steps.append((left + width - rect.left) / speed.x)
+  elif speed.x < 0:
+    steps.append((left - rect.right) / speed.x)
+  if speed.y > 0:
+    steps.append((top + height - rect.top) / speed.y)
+  elif speed.y < 0:
+    steps.append((top - rect.bottom) / speed.y)
+  if steps:
+    step = min(steps)
+    return left - speed.x * step, top - speed.y * step
+
+  dx, dy = min(((rect.left - left - width, 0), (rect.right - left, 0),
+                (0, rect.top - top - height), (0, rect.bottom - top)),
+               key=lambda push: abs(push[0] + push[1]))
+  return left + dx, top + dy
+
+
 class Player(world.Thing):
 
   BODY_SIZE = 20
   HEAD_RADIUS = 10
 
-  def __init__(self, start_pos: pygame.math.Vector2):
+  def __init__(self, start_pos: pygame.math.Vector2, world_clock=None):
     self._position = start_pos
+    self._tick_start = pygame.math.Vector2(start_pos)
+    self._world_clock = world_clock or clocks.WallClock()
     self._speed = pygame.math.Vector2(0, 0)
     self._current_jump = jump.NullJump()
     self._draw_bounding_rect = False
@@ -51,59 +115,82 @@ class Player(world.Thing):
     x, y = self._position
     return pygame.Rect(x - width / 2, y - height / 2, width, height)
 
+  @property
+  def swept_rect(self):
+    """Covers everywhere resolve_collisions() can put the player this tick.
+
+    That's the bounding rect from before the last move() to now. Backing
+    out of obstacles that were already overlapping can take the player
+    past the start, so there's a step's margin on every side."""
+    rect = self.bounding_rect
+    before = rect.move(-self._speed.x, -self._speed.y)
+    margin_x = 2 * math.ceil(abs(self._speed.x)) + 2
+    margin_y = 2 * math.ceil(abs(self._speed.y)) + 2
+    return rect.union(before).inflate(margin_x, margin_y)
+
   def move(self, wind):
     self._speed = self._player_speed()
     self._speed += wind.windspeed * 0.1  # Absorb some wind.
 
+    # Collisions are resolved along the way from here to the new position.
+    self._tick_start = pygame.math.Vector2(self._position)
     self._position += self._speed
+    # Until an obstacle stops the fall; see resolve_collisions().
+    self._on_solid_ground = False
 
     if self._currently_saying.done():
       self._currently_saying = speech_bubble.NullSpeechBubble()
 
   def collision_adjust(self, obstacle):
-    if not obstacle.bounding_rect.colliderect(self.bounding_rect):
-      return
+    self.resolve_collisions((obstacle,))
 
-    if obstacle.has_custom_collision:
-      obstacle.apply_custom_collision(player=self, current_speed=self._speed)
-    else:
-      # Otherwise: apply the normal algorithm.
-      self._back_up_until_not_colliding(obstacle)
+  def resolve_collisions(self, obstacles):
+    """Stops the player where its move this tick first runs into obstacles.
 
-  def say(self, what_to_say, duration_secs=5):
-    self._currently_saying = speech_bubble.SpeechBubble(
-        what_to_say, duration_secs)
-
-  def _back_up_until_not_colliding(self, obstacle):
-    them = obstacle.bounding_rect
-
-    # Reverse time until we no longer collide.
-    fraction_undone = 0.0
-    while them.colliderect(self.bounding_rect) and fraction_undone < 1.0:
-      self._position -= self._speed * 0.1
-      fraction_undone += 0.1
-
-    # Then, try moving forward each axis as much as possible.
-    # We can only hit a side or top of the rect at a time, so don't
-    # block movement in the other direction (this means we can slide)
-    # down the side of an obstacle and not get stuck in the side,
-    # for instance.
-    # TODO: probably causes the confusion below.
-    self._position.x += self._speed.x
-    if them.colliderect(self.bounding_rect):
-      self._position.x -= self._speed.x
-    self._position.y += self._speed.y
-    if them.colliderect(self.bounding_rect):
-      self._position.y -= self._speed.y
+    The move from where move() started to where it ended is swept against
+    all obstacles at once: first along x, then along y, so the player can
+    slide along what it hits. Where the player meets an obstacle is worked
+    out directly, so any speed costs the same and nothing is skipped over.
+    Obstacles with custom collision don't block; they get to act if the
+    move passes through them."""
+    width = Player.BODY_SIZE
+    height = Player.BODY_SIZE + Player.HEAD_RADIUS * 2
+    solid = [o.bounding_rect for o in obstacles if not o.has_custom_collision]
+
+    start = pygame.math.Vector2(self._tick_start)
+    left, top = start.x - width / 2, start.y - height / 2
+    # Get out of anything we started out inside, e.g. something that moved
+    # into us, by reversing time.
+    for rect in solid:
+      left, top = _back_out(left, top, width, height, rect, self._speed)
+
+    dx = self._position.x - width / 2 - left
+    dx, _ = _sweep(left, width, dx, top, height,
+                   [(r.left, r.right, r.top, r.bottom) for r in solid])
+    x_path = _span(left, dx, width) + (top, top + height)
+    left += dx
+
+    dy = self._position.y - height / 2 - top
+    dy, blocked = _sweep(top, height, dy, left, width,
+                         [(r.top, r.bottom, r.left, r.right) for r in solid])
+    y_path = (left, left + width) + _span(top, dy, height)
+    top += dy
+
+    self._position.x = left + width / 2
+    self._position.y = top + height / 2
+    if blocked:
       self._on_solid_ground = True
       self._current_jump = jump.NullJump()
-    else:
-      self._on_solid_ground = False
 
-    if fraction_undone >= 1.0:
-      # TODO: this happens when colliding with several obstacles at once.
-      # Find some way to deal with this.
-      print("collision algorithm is confused", flush=True)
+    for obstacle in obstacles:
+      if obstacle.has_custom_collision and (
+          _overlaps(x_path, obstacle.bounding_rect) or
+          _overlaps(y_path, obstacle.bounding_rect)):
+        obstacle.apply_custom_collision(player=self, current_speed=self._speed)
+
+  def say(self, what_to_say, duration_secs=5):
+    self._currently_saying = speech_bubble.SpeechBubble(
+        what_to_say, duration_secs, world_clock=self._world_clock)
 
   def draw(self, screen, viewpoint_pos: pygame.math.Vector2):
     # Interpret _position as the center of the player's bounding rect.
@@ -126,6 +213,18 @@ class Player(world.Thing):
 
     self._currently_saying.draw(screen, x, y, head_radius)
 
+  def mark_dirty(self, region, viewpoint_pos):
+    region.add_rect(self.bounding_rect.move(-viewpoint_pos))
+    x, y = to_draw_coords(self._position, viewpoint_pos)
+    bubble = self._currently_saying.bounds(x, y, Player.HEAD_RADIUS)
+    if bubble:
+      region.add_rect(bubble)
+
+  def snapshot(self):
+    frozen = copy.copy(self)
+    frozen._position = pygame.math.Vector2(self._position)
+    return frozen
+
   def _player_speed(self) -> pygame.Vector2:
     pressed = pygame.key.get_pressed()
 
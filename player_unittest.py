@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import pygame
 import unittest
 from unittest import mock
@@ -26,10 +27,11 @@ def move(player, wind=None):
 
 
 def keys(pressed_keycodes):
-  # pygame.key.get_pressed returns a bool list where
+  # pygame.key.get_pressed returns a bool sequence where
   # pressed[pygame.K_WHATEVER] == True means is the
-  # key is pressed.
-  return [x in pressed_keycodes for x in range(512)]
+  # key is pressed. Some keycodes are huge in pygame 2, so use a dict.
+  return collections.defaultdict(
+      bool, {keycode: True for keycode in pressed_keycodes})
 
 
 def make_player(start_pos):
@@ -178,8 +180,68 @@ class PlayerTest(unittest.TestCase):
     move(p)
     p.collision_adjust(o)
 
-    self.assertAlmostEqual(p.bounding_rect.bottom, 418, delta=1)
-    self.assertLess(p.at.x, 1)
+    # Backed out on top of the obstacle, and still moved left.
+    self.assertEqual(p.bounding_rect.bottom, 400)
+    self.assertLess(p.at.x, 0)
+
+  def test_swept_rect_covers_the_move(self):
+    p = make_player((100, 100))
+    before = p.bounding_rect
+
+    p._speed = pygame.math.Vector2(7, -12)
+    p._position += p._speed
+    swept = p.swept_rect
+
+    self.assertTrue(swept.contains(before))
+    self.assertTrue(swept.contains(p.bounding_rect))
+    self.assertTrue(swept.contains(before.move(-7, 12)))
+
+  def test_fast_player_does_not_tunnel_through_thin_obstacle(self):
+    p = make_player((0, 0))
+    thin = make_obstacle(-50, 300, width=100, height=2)
+
+    p.launch_into_air(pygame.math.Vector2(0, 1000))
+    move(p)
+    p.resolve_collisions([thin])
+
+    self.assertEqual(p.bounding_rect.bottom, 300)
+
+  def test_lands_on_the_seam_between_two_obstacles(self):
+    p = make_player((20, 300))
+    left = make_obstacle(0, 400)
+    right = make_obstacle(20, 400)
+
+    for _ in range(20):
+      move(p)
+      p.resolve_collisions([left, right])
+
+    self.assertEqual(p.bounding_rect.bottom, 400)
+    self.assertEqual(p.at.x, 20)
+
+  @mock.patch('pygame.key.get_pressed')
+  def test_slides_down_along_a_wall(self, get_pressed):
+    get_pressed.return_value = keys([pygame.K_RIGHT])
+    p = make_player((0, 0))
+    wall = make_obstacle(10, -100, width=20, height=500)
+
+    move(p)
+    p.resolve_collisions([wall])
+
+    self.assertEqual(p.bounding_rect.right, 10)
+    self.assertGreater(p.at.y, 0)
+
+  def test_passing_through_a_trampoline_launches(self):
+    p = make_player((0, 0))
+    trampoline = mock.Mock(has_custom_collision=True,
+                           bounding_rect=pygame.Rect(-50, 300, 100, 2))
+
+    p.launch_into_air(pygame.math.Vector2(0, 1000))
+    move(p)
+    p.resolve_collisions([trampoline])
+
+    trampoline.apply_custom_collision.assert_called_once_with(
+        player=p, current_speed=p._speed)
+
 
 # Initialize pygame once.
 pygame.init()
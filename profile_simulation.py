@@ -33,7 +33,7 @@ game = simulation.Simulation(screen, pygame.math.Vector2(size), clock)
 
 def advance_n_steps(n):
   for _ in range(n):
-    game.advance(1.0)
+    game.advance()
 
 with tempfile.NamedTemporaryFile() as stats_file:
   start = timeit.default_timer()
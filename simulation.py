@@ -12,41 +12,110 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import pygame
 import random
 
+import clocks
 import debug_panel
+import hashgrid
 import kdtree
 import obstacles
+import parallel_snow
 import player
 import snow
+import timing
 import trampolines
 import winds
 
 
-def _generate_level(size, viewpoint_pos):
-  some_obstacles = [obstacles.random_obstacle(size) for _ in range(20)]
+# The ways of indexing obstacles a simulation can use, by name.
+SPATIAL_INDEXES = {'kdtree': kdtree.obstacle_kd_tree,
+                   'hashgrid': hashgrid.obstacle_hash_grid}
+
+
+NUM_OBSTACLES = 20
+
+
+# Everything draw_snapshot() needs to draw the world. Simulation.snapshot()
+# makes ones that don't change, to draw on another thread.
+Snapshot = collections.namedtuple(
+    'Snapshot', ['player', 'player_pos', 'previous_player_pos',
+                 'viewpoint_pos', 'previous_viewpoint_pos', 'obstacles',
+                 'snowfall', 'game_ended', 'debugged_values'])
+
+
+def _generate_level(size, viewpoint_pos, spatial_index, num_obstacles,
+                    num_moving_obstacles):
+  # Bigger levels go on further to the right, so they're about as crowded
+  # as the normal one.
+  bounds = (size.x * max(1, num_obstacles // NUM_OBSTACLES), size.y)
+  some_obstacles = [obstacles.random_obstacle(bounds)
+                    for _ in range(num_obstacles)]
+  some_obstacles += [obstacles.random_moving_obstacle(bounds)
+                     for _ in range(num_moving_obstacles)]
   ground_level = size.y - 20
   ground = obstacles.load_ground(
       y=ground_level, initial_viewpoint_pos=viewpoint_pos)
   some_trampolines = [trampolines.random_trampoline(
       ground_y=ground_level, bounds=size) for _ in range(0)]
-  return kdtree.obstacle_kd_tree([ground] + some_obstacles + some_trampolines)
+  return spatial_index([ground] + some_obstacles + some_trampolines)
+
+
+def _world_bounds(size):
+  # Snow that gets blown past these edges is never coming back. The world
+  # ends at x = 0 on the left, but goes on for a while to the right.
+  return pygame.Rect(0, -size.y, size.x * 10, size.y * 3)
 
 
 class Simulation(object):
 
-  def __init__(self, screen, size: pygame.math.Vector2, clock: pygame.time.Clock):
+  def __init__(self, screen, size: pygame.math.Vector2, clock: pygame.time.Clock,
+               spatial_index=kdtree.obstacle_kd_tree, snow_workers=1,
+               world_clock=None, num_obstacles=NUM_OBSTACLES, wind=None,
+               num_moving_obstacles=0):
+    """Sets up a new level.
+
+    screen and clock may be None when running headless; such simulations
+    can advance() but not draw()."""
     self._screen = screen
     self._size = size
     self._master_clock = clock
     self.viewpoint_pos = pygame.math.Vector2(0.0, 0.0)
-    self._obstacles = _generate_level(size, self.viewpoint_pos)
+    # Everything with a timer in the world reads the time off this clock.
+    # Pass a clocks.SimulatedClock to make the world's time depend only on
+    # how many times advance() was called.
+    self.world_clock = world_clock or clocks.WallClock()
+    # spatial_index builds the index we look up obstacles in, e.g.
+    # kdtree.obstacle_kd_tree or hashgrid.obstacle_hash_grid. It's updated in
+    # place when obstacles move.
+    self._obstacles = _generate_level(size, self.viewpoint_pos, spatial_index,
+                                      num_obstacles, num_moving_obstacles)
+    self._kinematic_obstacles = [obstacle for obstacle in
+                                 self._obstacles.walk_preorder()
+                                 if obstacle.is_kinematic]
     start_pos = pygame.math.Vector2(size.x / 2 + 100, size.y - 100)
-    self._player = player.Player(start_pos=start_pos)
-    self._snowfall = snow.Snowfall()
-    self._wind = winds.Gust(direction=pygame.math.Vector2(-1, 0))
-    self._debug_panel = debug_panel.DebugPanel(pygame.math.Vector2(0, 0))
+    self._player = player.Player(start_pos=start_pos,
+                                 world_clock=self.world_clock)
+    # Where things were one tick ago, to draw in between ticks.
+    self._previous_player_pos = pygame.math.Vector2(start_pos)
+    self._previous_viewpoint_pos = pygame.math.Vector2(self.viewpoint_pos)
+    # Paces advance_for().
+    self.timestep = clocks.FixedTimestep()
+    if snow_workers > 1:
+      self._snowfall = parallel_snow.ParallelSnowfall(
+          snow_workers, world_bounds=_world_bounds(size))
+    else:
+      self._snowfall = snow.Snowfall(world_bounds=_world_bounds(size))
+    self._wind = wind or winds.Gust(direction=pygame.math.Vector2(-1, 0),
+                                    world_clock=self.world_clock)
+    self._debug_panel = debug_panel.NullDebugPanel()
+    if screen:
+      self._debug_panel = debug_panel.DebugPanel(pygame.math.Vector2(0, 0))
+    # How long each phase of advance() and draw() takes. Turn these off
+    # with timers.enabled = False when nobody's looking at them.
+    self.timers = timing.PhaseTimers()
+    self._snowfall.timers = self.timers
     self.game_ended = False
 
   @property
@@ -54,36 +123,134 @@ class Simulation(object):
     return self._snowfall
 
   def advance(self):
-    self._wind.update()
-    if not self.game_ended:
-      self._player.move(self._wind)
-    for obstacle in self._obstacles.walk_preorder():
-      self._player.collision_adjust(obstacle)
-
-    self._snowfall.spawn_snowflakes()
-    self._snowfall.move_snow(self._obstacles, self._wind)
+    with self.timers.time('advance'):
+      self._advance()
+
+  def advance_for(self, elapsed_seconds):
+    """Advances as many ticks as elapsed_seconds is worth.
+
+    Ticks are always clocks.SECONDS_PER_TICK long. Call draw() with
+    alpha=timestep.alpha afterwards to draw the time in between."""
+    for _ in range(self.timestep.ticks_for_frame(elapsed_seconds)):
+      self.advance()
+
+  def _advance(self):
+    timers = self.timers
+    self._previous_player_pos.update(self._player.at)
+    self._previous_viewpoint_pos.update(self.viewpoint_pos)
+    self.world_clock.tick()
+    with timers.time('wind'):
+      self._wind.update()
+    with timers.time('kinematic'):
+      for obstacle in self._kinematic_obstacles:
+        obstacle.update()
+        self._obstacles.refit(obstacle)
+    with timers.time('player move'):
+      if not self.game_ended:
+        self._player.move(self._wind)
+    with timers.time('player collision'):
+      # Only obstacles near the player can be hit this tick.
+      self._player.resolve_collisions(
+          self._obstacles.query_rect(self._player.swept_rect))
+
+    with timers.time('spawn'):
+      self._snowfall.spawn_snowflakes()
+    with timers.time('move_snow'):
+      self._snowfall.move_snow(self._obstacles, self._wind)
     self._move_viewpoint(self._player.at)
 
     if self._player.at.x < 0:
       self.game_ended = True
 
-  def draw(self):
-    if not self.game_ended:
-      self._player.draw(self._screen, self.viewpoint_pos)
-    for obstacle in self._obstacles.walk_preorder():
-      obstacle.draw(self._screen, self.viewpoint_pos)
+  def draw(self, alpha=1.0, dirty_region=None):
+    """Draws the world alpha of the way from the last tick to the current.
+
+    Moving the player and the view smoothly between ticks keeps the
+    motion smooth when frames and ticks don't line up. If dirty_region is
+    given, everything drawn marks where it can change in it."""
+    # The world as it is, without copying anything.
+    self.draw_snapshot(Snapshot(
+        player=self._player, player_pos=self._player.at,
+        previous_player_pos=self._previous_player_pos,
+        viewpoint_pos=self.viewpoint_pos,
+        previous_viewpoint_pos=self._previous_viewpoint_pos,
+        obstacles=self._obstacles.walk_preorder(), snowfall=self._snowfall,
+        game_ended=self.game_ended, debugged_values=None), alpha, dirty_region)
+
+  def snapshot(self):
+    """Returns a Snapshot of the world that won't change when it does."""
+    return Snapshot(
+        player=self._player.snapshot(),
+        player_pos=pygame.math.Vector2(self._player.at),
+        previous_player_pos=pygame.math.Vector2(self._previous_player_pos),
+        viewpoint_pos=pygame.math.Vector2(self.viewpoint_pos),
+        previous_viewpoint_pos=pygame.math.Vector2(self._previous_viewpoint_pos),
+        obstacles=tuple(obstacle.snapshot()
+                        for obstacle in self._obstacles.walk_preorder()),
+        snowfall=self._snowfall.snapshot(), game_ended=self.game_ended,
+        debugged_values=self._debugged_values())
+
+  def draw_snapshot(self, snapshot, alpha=1.0, dirty_region=None):
+    """Like draw(), but draws a snapshot instead of the world."""
+    with self.timers.time('draw'):
+      self._draw(snapshot, alpha, dirty_region)
+
+  def _draw(self, snapshot, alpha, dirty_region):
+    timers = self.timers
+    viewpoint_pos = snapshot.previous_viewpoint_pos.lerp(
+        snapshot.viewpoint_pos, alpha)
+    drawn = []
+    obstacles = snapshot.obstacles
+    if dirty_region is not None:
+      # draw() passes an iterator, and it's walked again below.
+      obstacles = list(obstacles)
+    with timers.time('draw player'):
+      if not snapshot.game_ended:
+        player_pos = snapshot.previous_player_pos.lerp(snapshot.player_pos,
+                                                       alpha)
+        # The player draws itself at its position; shift the view instead.
+        player_viewpoint_pos = viewpoint_pos + snapshot.player_pos - player_pos
+        snapshot.player.draw(self._screen, player_viewpoint_pos)
+        drawn.append((snapshot.player, player_viewpoint_pos))
+    with timers.time('draw obstacles'):
+      for obstacle in obstacles:
+        obstacle.draw(self._screen, viewpoint_pos)
+
+    with timers.time('draw snow'):
+      snapshot.snowfall.draw(self._screen, viewpoint_pos)
+
+    with timers.time('draw debug'):
+      self._debug_panel.debugged_values = (snapshot.debugged_values or
+                                           self._debugged_values())
+      self._debug_panel.sparkline = self.timers.histogram('frame').samples
+      self._debug_panel.draw(self._screen, snapshot.viewpoint_pos)
 
-    self._snowfall.draw(self._screen, self.viewpoint_pos)
+    if dirty_region is None:
+      return
+    with timers.time('mark dirty'):
+      dirty_region.viewpoint_pos = viewpoint_pos
+      drawn.extend((obstacle, viewpoint_pos) for obstacle in obstacles)
+      drawn.append((snapshot.snowfall, viewpoint_pos))
+      drawn.append((self._debug_panel, snapshot.viewpoint_pos))
+      for drawable, drawn_from in drawn:
+        drawable.mark_dirty(dirty_region, drawn_from)
 
-    kd_search_lru = kdtree.ObstacleKdTree._memoized_search.cache_info()
-    kd_hit_rate = float(kd_search_lru.hits) * 100 / \
-        (kd_search_lru.hits + kd_search_lru.misses + 1)
-    self._debug_panel.debugged_values = {'flakes': self._snowfall.snowflakes.num_positions(),
-                                         'fps': '%.1f' % self._master_clock.get_fps(),
-                                         'spawn_rate': '%d' % self._snowfall.spawn_rate,
-                                         'wind': '(%s)' % self._wind.windspeed,
-                                         'kd search': '%.2f%%' % kd_hit_rate}
-    self._debug_panel.draw(self._screen, self.viewpoint_pos)
+  def _debugged_values(self):
+    cache = self._obstacles.cache_stats()
+    cache_hit_rate = float(cache.hits) * 100 / (cache.hits + cache.misses + 1)
+    num_flakes = self._snowfall.snowflakes.num_positions()
+    debugged_values = {'flakes': '%d/%d' % (num_flakes, self._snowfall.max_flakes),
+                       'dropped': self._snowfall.dropped_flakes,
+                       'killed': self._snowfall.killed_flakes,
+                       'fps': '%.1f' % (self._master_clock.get_fps() if self._master_clock else 0),
+                       'spawn_rate': '%d' % self._snowfall.spawn_rate,
+                       'wind': '(%s)' % self._wind.windspeed,
+                       'dropped time': '%.1f s' % self.timestep.dropped_seconds,
+                       'search cache': '%.2f%% of %d cells' % (cache_hit_rate, cache.cells)}
+    # p50/p95/p99 of each phase, in ms.
+    for phase, percentiles in self.timers.summary().items():
+      debugged_values[phase] = '/'.join('%.1f' % p for p in percentiles)
+    return debugged_values
 
   def suspend(self):
     # Stop annoying things at least, like sounds.
@@ -101,9 +268,11 @@ class Simulation(object):
 
     return None
 
-  def after_obstacle_moved(self):
-    all_obstacles = list(self._obstacles.walk_preorder())
-    self._obstacles = kdtree.obstacle_kd_tree(all_obstacles)
+  def after_obstacle_moved(self, obstacle):
+    # Cheap enough to do for every step of a drag, so the snow sees the
+    # obstacle where it is right now.
+    with self.timers.time('refit index'):
+      self._obstacles.refit(obstacle)
 
   def _move_viewpoint(self, player_pos):
     # Just center on player for now, but clamp so we don't show too
@@ -12,14 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import functools
+import copy
 import math
+import numpy
 import pygame
 import random
-import time
 
 import arrays
 import kdtree
+import timing
 import world
 import winds
 
@@ -28,6 +29,64 @@ FALL_SPEED = 5
 DOWN_LEFT = pygame.math.Vector2(-FALL_SPEED, FALL_SPEED)
 DOWN_RIGHT = pygame.math.Vector2(FALL_SPEED, FALL_SPEED)
 WHITE = pygame.Color(255, 255, 255)
+TRANSPARENT = pygame.Color(0, 0, 0)
+MAX_FLAKES = 300000
+
+# What Snowfall does with new snow when it already holds max_flakes flakes.
+DROP_OLDEST = 'drop_oldest'
+REFUSE_SPAWN = 'refuse_spawn'
+
+
+def _draw_flakes_per_flake(screen, viewpoint_pos, positions):
+  for x, y in positions:
+    screen.set_at((int(x - viewpoint_pos.x),
+                   int(y - viewpoint_pos.y)), WHITE)
+
+
+def _screen_coords(viewpoint_pos, positions):
+  # Subtract in double precision and truncate toward zero, exactly like
+  # int(x - viewpoint_pos.x) does in the per-flake path.
+  xs = (positions[:, 0].astype(numpy.float64) -
+        viewpoint_pos.x).astype(numpy.int64)
+  ys = (positions[:, 1].astype(numpy.float64) -
+        viewpoint_pos.y).astype(numpy.int64)
+  return xs, ys
+
+
+def _draw_flakes_bulk(screen, viewpoint_pos, positions):
+  xs, ys = _screen_coords(viewpoint_pos, positions)
+  del positions
+
+  # set_at silently ignores pixels outside the clip rect; cull those.
+  clip = screen.get_clip()
+  visible = ((xs >= clip.left) & (xs < clip.right) &
+             (ys >= clip.top) & (ys < clip.bottom))
+
+  pixels = pygame.surfarray.pixels2d(screen)
+  pixels[xs[visible], ys[visible]] = screen.map_rgb(WHITE)
+  # Deleting the pixel array unlocks the surface again.
+  del pixels
+
+
+class _FrozenSnowfall(world.Drawable):
+  """The flakes of a Snowfall at one point in time; see Snowfall.snapshot."""
+
+  def __init__(self, positions, bulk_draw):
+    # A (n, 2) array of its own.
+    self._positions = positions
+    self._bulk_draw = bulk_draw
+
+  def draw(self, screen, viewpoint_pos):
+    if self._bulk_draw and screen.get_bytesize() != 3:
+      _draw_flakes_bulk(screen, viewpoint_pos, self._positions)
+    else:
+      _draw_flakes_per_flake(screen, viewpoint_pos, self._positions.tolist())
+
+  def mark_dirty(self, region, viewpoint_pos):
+    region.add_points(*_screen_coords(viewpoint_pos, self._positions))
+
+  def snapshot(self):
+    return self
 
 
 class Snowfall(world.Drawable):
@@ -36,67 +95,193 @@ class Snowfall(world.Drawable):
   _progress_delta = 0.01
   speed = DOWN_LEFT
 
-  def __init__(self):
-    self._snowflakes = arrays.FastPosArray()
+  def __init__(self, max_flakes=MAX_FLAKES, overflow_policy=DROP_OLDEST,
+               world_bounds=None):
+    self._snowflakes = arrays.FastPosArray(capacity=max_flakes)
     self.spawn_rate = 40
+    self.max_flakes = max_flakes
+    self.overflow_policy = overflow_policy
+    # Flakes that leave this rect are removed. None means no kill planes.
+    self.world_bounds = world_bounds
+    # Flakes thrown away because the pool was full, or because they left
+    # the world bounds.
+    self.dropped_flakes = 0
+    self.killed_flakes = 0
+    # Step all flakes as numpy array operations rather than one by one.
+    # The per-flake path is kept as a reference implementation.
+    self.vectorized = True
+    # Same thing for drawing: write all visible flakes into the screen's
+    # pixels at once rather than calling set_at for each of them.
+    self.bulk_draw = True
+    # Where move_snow() reports how long its phases took.
+    self.timers = timing.DISABLED
 
   @property
   def snowflakes(self):
     return self._snowflakes
 
   def draw(self, screen, viewpoint_pos):
-    for x, y in self._snowflakes.all_positions:
-      screen.set_at((int(x - viewpoint_pos.x),
-                     int(y - viewpoint_pos.y)), WHITE)
+    # surfarray can't reference the pixels of 24-bit surfaces.
+    if self.bulk_draw and screen.get_bytesize() != 3:
+      _draw_flakes_bulk(screen, viewpoint_pos, self._snowflakes.xy_view())
+    else:
+      _draw_flakes_per_flake(screen, viewpoint_pos,
+                             self._snowflakes.all_positions)
+
+  def mark_dirty(self, region, viewpoint_pos):
+    region.add_points(*_screen_coords(viewpoint_pos,
+                                      self._snowflakes.xy_view()))
+
+  def snapshot(self):
+    return _FrozenSnowfall(self._snowflakes.xy_view().copy(), self.bulk_draw)
 
   def spawn_snowflakes(self):
     Snowfall.tick_snowflake_angle()
-    for _ in range(self.spawn_rate):
-      self._snowflakes.append(x=200 + random.random() * 1000, y=0)
+    xs = [200 + random.random() * 1000 for _ in range(self.spawn_rate)]
+    self._add_flakes(xs, numpy.zeros(len(xs)))
 
   def spawn_snowball(self, position):
-    # This is a pretty stupid algorithm but let's go with it for now.
-    x_center = int(position.x)
-    y_center = int(position.y)
-    for x in range(x_center - 20, x_center + 20):
-      for y in range(y_center - 20, y_center + 20):
-        self._snowflakes.append(x=x, y=y)
+    with self.timers.time('spawn snowball'):
+      # This is a pretty stupid algorithm but let's go with it for now.
+      x_center = int(position.x)
+      y_center = int(position.y)
+      xs, ys = numpy.meshgrid(numpy.arange(x_center - 20, x_center + 20),
+                              numpy.arange(y_center - 20, y_center + 20),
+                              indexing='ij')
+      self._add_flakes(xs.ravel(), ys.ravel())
 
   def move_snow(self, obstacles: kdtree.ObstacleKdTree, wind):
-    to_delete = []
     delta = (Snowfall.speed + wind.windspeed)
+    with self.timers.time('snow step'):
+      if self.vectorized:
+        self._move_snow_vectorized(obstacles, delta)
+      else:
+        self._move_snow_per_flake(obstacles, delta)
+
+      if self.world_bounds:
+        self._kill_flakes_outside(self.world_bounds)
+
+    with self.timers.time('snow drift'):
+      for obstacle in obstacles.walk_preorder():
+        bounds_version = obstacle.snowpile.bounds_version
+        self._add_drift(obstacle.snowpile.drift_from_wind(wind))
+        if obstacle.snowpile.bounds_version != bounds_version:
+          obstacles.refit(obstacle)
+
+  def _add_flakes(self, xs, ys):
+    count = self._snowflakes.num_positions()
+    overflow = count + len(xs) - self.max_flakes
+    if overflow > 0:
+      self.dropped_flakes += overflow
+      if self.overflow_policy == REFUSE_SPAWN:
+        keep = max(len(xs) - overflow, 0)
+        xs = xs[:keep]
+        ys = ys[:keep]
+      else:
+        # The pool keeps flakes in the order they were added, so the
+        # oldest ones are at the front, and dropping them moves nothing.
+        dropped_from_pool = min(overflow, count)
+        self._snowflakes.delete_first(dropped_from_pool)
+        skip = overflow - dropped_from_pool
+        xs = xs[skip:]
+        ys = ys[skip:]
+
+    if len(xs):
+      self._snowflakes.extend_xy(xs, ys)
+
+  def _add_drift(self, drift_snow):
+    if len(drift_snow):
+      self._add_flakes(drift_snow[:, 0], drift_snow[:, 1])
+
+  def _kill_flakes_outside(self, bounds):
+    positions = self._snowflakes.xy_view()
+    xs = positions[:, 0]
+    ys = positions[:, 1]
+    inside = ((xs >= bounds.left) & (xs < bounds.right) &
+              (ys >= bounds.top) & (ys < bounds.bottom))
+    del positions, xs, ys
+
+    killed = len(inside) - numpy.count_nonzero(inside)
+    if killed:
+      self._snowflakes.keep(inside)
+      self.killed_flakes += killed
+
+  def _move_snow_per_flake(self, obstacles, delta):
+    to_delete = []
+    drift_snow = []
     for i in range(self._snowflakes.num_positions()):
       x, y = self._snowflakes.write_add(i, x=delta.x, y=delta.y)
-      collided = self._handle_snowflake_collision(obstacles, x, y)
+      collided = self._handle_snowflake_collision(obstacles, x, y, drift_snow)
       if collided:
         to_delete.append(i)
 
-    # Sweep all the resting snowflakes we marked above. Go backwards
-    # so we don't invalidate earlier indices.
-    for index in sorted(to_delete, reverse=True):
-      self._snowflakes.delete(index)
-
-    for obstacle in obstacles.walk_preorder():
-      drift_snow = obstacle.snowpile.drift_from_wind(wind)
-      for flake in drift_snow:
-        self._snowflakes.append(x=flake.x, y=flake.y)
-
-  def _handle_snowflake_collision(self, obstacles, x, y):
+    # Sweep all the resting snowflakes we marked above in one go. keep()
+    # leaves the oldest flakes in front for DROP_OLDEST.
+    landed = numpy.zeros(self._snowflakes.num_positions(), dtype=bool)
+    landed[to_delete] = True
+    self._snowflakes.keep(~landed)
+    self._add_drift(_concatenate_drift(drift_snow))
+
+  def _move_snow_vectorized(self, obstacles, delta):
+    positions = self._snowflakes.xy_view()
+    positions += (delta.x, delta.y)
+
+    hits = obstacles.query_points(
+        positions[:, 0], positions[:, 1],
+        hit_rect=lambda obstacle: obstacle.bounding_rect_with_snow)
+    del positions
+    with self.timers.time('land flakes'):
+      self._land_flakes(obstacles, hits)
+
+  def _land_flakes(self, obstacles, hits):
+    """Moves flakes onto the snowpiles of the obstacles they hit.
+
+    hits holds, for each flake, the walk_preorder() index of the obstacle
+    it hit or -1, like the spatial indexes' query_points returns."""
+    positions = self._snowflakes.xy_view()
+
+    # Group the landed flakes by the obstacle they hit.
+    all_obstacles = list(obstacles.walk_preorder())
+    landed = numpy.flatnonzero(hits >= 0)
+    landed = landed[numpy.argsort(hits[landed], kind='stable')]
+    hit_obstacles, starts = numpy.unique(hits[landed], return_index=True)
+    landings = [(all_obstacles[obstacle_index], positions[flakes])
+                for obstacle_index, flakes in
+                zip(hit_obstacles, numpy.split(landed, starts[1:]))]
+
+    # Let go of the view before the array gets resized.
+    del positions
+    self._snowflakes.keep(hits < 0)
+
+    for obstacle, landed_positions in landings:
+      self._add_drift(obstacle.snowpile.add_many(landed_positions[:, 0],
+                                                 landed_positions[:, 1]))
+      # The snow grew, so the obstacle's indexed rect may have too.
+      obstacles.refit(obstacle)
+
+  def _handle_snowflake_collision(self, obstacles, x, y, drift_snow):
     candidates = obstacles.quick_search(pos=(x, y))
     for obstacle in candidates:
       rect = obstacle.bounding_rect_with_snow
       if not rect.collidepoint(x, y):
         continue
 
-      drift_snow = obstacle.snowpile.add(
-          snowflake_pos=pygame.math.Vector2(x, y))
-      for flake in drift_snow:
-        self._snowflakes.append(x=flake.x, y=flake.y)
+      drift_snow.append(obstacle.snowpile.add(
+          snowflake_pos=pygame.math.Vector2(x, y)))
+      obstacles.refit(obstacle)
       return True
 
     # Did not collide with anything.
     return False
 
+  @classmethod
+  def reset_snowflake_angle(cls):
+    # The angle is shared by all snowfalls, so runs that want the same
+    # snow every time have to start it over.
+    cls._snowflake_progress = 0.5
+    cls._progress_delta = 0.01
+    cls.speed = DOWN_LEFT
+
   @classmethod
   def tick_snowflake_angle(cls):
     cls._snowflake_progress += cls._progress_delta
@@ -119,11 +304,23 @@ class Snowfall(world.Drawable):
 # /    \_/       \
 #
 # It's just bunch of heights. If a new snowflake lands, it increases
-# the height of the nearest column somewhat.
+# the height of the nearest column somewhat. The heights live in a numpy
+# array so a whole tick's worth of flakes can be added in one go.
 
 # Total snowpile width = WIDTH_PER_COLUMN * num columns.
 WIDTH_PER_COLUMN = 2
 
+# Snow blown off piles comes back as a (n, 2) array of flake positions.
+_NO_DRIFT = numpy.zeros((0, 2), dtype=numpy.float32)
+_NO_DRIFT.flags.writeable = False
+
+
+def _concatenate_drift(drift_snow):
+  drift_snow = [drift for drift in drift_snow if len(drift)]
+  if not drift_snow:
+    return _NO_DRIFT
+  return numpy.concatenate(drift_snow)
+
 
 def spawn_snowpile(spawned_on: pygame.Rect):
   num_columns = math.ceil(spawned_on.width / WIDTH_PER_COLUMN)
@@ -138,15 +335,28 @@ def move_snowpile(snowpile, spawned_on: pygame.Rect):
 class Snowpile(world.Thing):
 
   def __init__(self, num_columns, bottom_left_pos: pygame.math.Vector2):
-    self._snow_heights = [0] * num_columns
+    self._snow_heights = numpy.zeros(num_columns, dtype=numpy.int64)
     self._bottom_left_pos = bottom_left_pos
     self._draw_bounding_box = True
-    self._estimated_height = 10
-    self._next_bounds_update = time.time()
     self.emit_snowflakes = True
+    # The pile is drawn from a cached surface, re-rendered only when the
+    # heights have changed since the last draw.
+    self._surface = None
+    self._surface_dirty = True
+    # The bounds are kept up to date as snow lands and drifts. Bumped every
+    # time they change, so others can tell if bounds they cached are stale.
+    self.bounds_version = 0
+    # The height of the tallest column. Growing columns raise it as they
+    # go; only if the tallest column shrank do all columns get rescanned.
+    self._max_height = 0
+    self._tallest_shrank = False
+    self._bounds_stale = False
+    self._bounding_rect = pygame.Rect(0, 0, 0, 0)
+    self._update_bounding_rect()
 
   def move(self, new_bottom_left_pos):
     self._bottom_left_pos = new_bottom_left_pos
+    self._update_bounding_rect()
 
   def add(self, snowflake_pos):
     relative_pos = snowflake_pos - self._bottom_left_pos
@@ -156,16 +366,43 @@ class Snowpile(world.Thing):
       # This can happen if snowflakes hit from an angle.
       column = random.randint(0, len(self._snow_heights) - 1)
 
-    self._snow_heights[column] += 1
-    self._maybe_estimate_height()
-
-    return self._rebalance_snowpile(around_column=column)
+    self._raise(column, 1)
+    drift_snow = self._rebalance_snowpile(around_column=column)
+    self._heights_changed()
+    return drift_snow
+
+  def add_many(self, xs, ys):
+    """Adds a batch of snowflakes that landed on the pile.
+
+    Does the same as add() for each flake, but bins all flakes into their
+    columns at once and then rebalances once per column that got snow."""
+    xs = numpy.asarray(xs, dtype=numpy.float64)
+    ys = numpy.asarray(ys, dtype=numpy.float64)
+    num_columns = len(self._snow_heights)
+    # Truncate toward zero like int() in add().
+    columns = ((xs - self._bottom_left_pos.x) /
+               WIDTH_PER_COLUMN).astype(numpy.int64)
+    misplaced = numpy.flatnonzero((columns < 0) | (columns >= num_columns) |
+                                  (ys > self._bottom_left_pos.y))
+    # This can happen if snowflakes hit from an angle.
+    columns[misplaced] = random.choices(range(num_columns), k=len(misplaced))
+
+    landed_per_column = numpy.bincount(columns, minlength=num_columns)
+    self._snow_heights += landed_per_column
+    landed_columns = numpy.flatnonzero(landed_per_column)
+    if len(landed_columns):
+      self._grew_to(int(self._snow_heights[landed_columns].max()))
+
+    drift_snow = [self._rebalance_snowpile(around_column=column)
+                  for column in landed_columns.tolist()]
+    self._heights_changed()
+    return _concatenate_drift(drift_snow)
 
   # TODO: unify with rebalancing, implement right drifting
   def drift_from_wind(self, wind):
     if not self.emit_snowflakes:
       # TODO: drifting looks weird on the ground, figure out what to do here.
-      return []
+      return _NO_DRIFT
 
     # Stronger wind = affect more of the snowpile.
     size = len(self._snow_heights)
@@ -175,20 +412,28 @@ class Snowpile(world.Thing):
 
     left_wind = wind.windspeed.x < 0
     dislodged_flakes = int(10 * force_percentage)
-    to_emit = 0
     if left_wind:
-      for column in columns:
-        self._snow_heights[column] -= dislodged_flakes
-        to_emit += dislodged_flakes
-        if self._snow_heights[column] < 0:
-          to_emit -= self._snow_heights[column]
-          self._snow_heights[column] = 0
-      self._snow_heights[0] += to_emit
-      return self._bleed_snowflakes_off_side(0, spawn_x=-5)
+      # The columns are all different, so they can be lowered at once.
+      columns = numpy.array(columns, dtype=numpy.intp)
+      heights = self._snow_heights[columns]
+      if (dislodged_flakes and len(columns) and
+          heights.max() == self._max_height):
+        self._tallest_shrank = True
+      # Columns can't go below zero.
+      dislodged = numpy.minimum(heights, dislodged_flakes)
+      self._snow_heights[columns] = heights - dislodged
+      moved = int(dislodged.sum())
+      self._raise(0, moved)
+      height_before_bleed = self._snow_heights[0]
+      drift_snow = self._bleed_snowflakes_off_side(0, spawn_x=-5)
+      # Light wind over a bare pile changes nothing; keep the cached surface.
+      if moved or self._snow_heights[0] != height_before_bleed:
+        self._heights_changed()
+      return drift_snow
     else:
       pass
 
-    return []
+    return _NO_DRIFT
 
   def _rebalance_snowpile(self, around_column):
     left_side = around_column < len(self._snow_heights) / 2
@@ -206,19 +451,19 @@ class Snowpile(world.Thing):
     # TODO: revisit this, why give up if diff < 3?
     diff = self._snow_heights[column] - self._snow_heights[column - 1]
     if diff < 3:
-      return []
+      return _NO_DRIFT
     drift_count = random.randint(1, int(diff / 2))
 
-    self._snow_heights[column] -= drift_count
+    self._lower(column, drift_count)
 
     while column >= 0:
       diff = self._snow_heights[column] - self._snow_heights[column - 1]
       if diff > drift_count:
-        self._snow_heights[column - 1] += drift_count
-        return []
+        self._raise(column - 1, drift_count)
+        return _NO_DRIFT
       column -= 1
 
-    self._snow_heights[0] += drift_count
+    self._raise(0, drift_count)
     return spawn_left()
 
   def _drift_snow_right(self, column):
@@ -231,60 +476,80 @@ class Snowpile(world.Thing):
 
     diff = self._snow_heights[column] - self._snow_heights[column + 1]
     if diff < 3:
-      return []
+      return _NO_DRIFT
     drift_count = random.randint(1, int(diff / 2))
 
-    self._snow_heights[column] -= drift_count
+    self._lower(column, drift_count)
 
     rightmost = len(self._snow_heights) - 1
     while column < rightmost:
       diff = self._snow_heights[column] - self._snow_heights[column + 1]
       if diff > drift_count:
-        self._snow_heights[column + 1] += drift_count
-        return []
+        self._raise(column + 1, drift_count)
+        return _NO_DRIFT
       column += 1
 
-    self._snow_heights[rightmost] += drift_count
+    self._raise(rightmost, drift_count)
     return spawn_right()
 
   def _bleed_snowflakes_off_side(self, column, spawn_x):
     if self._snow_heights[column] < 3:
-      return []
+      return _NO_DRIFT
 
-    spawn_count = self._snow_heights[column] - 3
-    self._snow_heights[column] -= spawn_count
+    spawn_count = int(self._snow_heights[column]) - 3
+    self._lower(column, spawn_count)
     if not self.emit_snowflakes:
       # Not emitting, just make 'em disappear.
-      return []
-
-    topleft = pygame.math.Vector2(self.bounding_rect.topleft)
-
-    y_off_side = lambda: random.randint(0, self.bounding_rect.height)
-    return [topleft + pygame.math.Vector2(spawn_x, y_off_side())
-            for _ in range(spawn_count)]
-
-  @functools.lru_cache()
-  # Implementation note: bottom_left needs to be a parameter, or
-  # the rect doesn't move when the obstacle moves.
-  def _make_rect(self, height, bottom_left_pos_x, bottom_left_pos_y):
-    if height < FALL_SPEED * 2:
-      # Make the bounding rect big enough to catch some snowflakes.
-      height = FALL_SPEED * 2
+      return _NO_DRIFT
+
+    left, top = self.bounding_rect.topleft
+    drift_snow = numpy.empty((spawn_count, 2), dtype=numpy.float32)
+    drift_snow[:, 0] = left + spawn_x
+    drift_snow[:, 1] = random.choices(
+        range(top, top + self.bounding_rect.height + 1), k=spawn_count)
+    return drift_snow
+
+  def _raise(self, column, amount):
+    height = int(self._snow_heights[column]) + amount
+    self._snow_heights[column] = height
+    self._grew_to(height)
+
+  def _grew_to(self, height):
+    if height > self._max_height:
+      self._max_height = height
+      self._bounds_stale = True
+
+  def _lower(self, column, amount):
+    height = int(self._snow_heights[column])
+    if height == self._max_height:
+      self._tallest_shrank = True
+    self._snow_heights[column] = height - amount
+
+  def _heights_changed(self):
+    self._surface_dirty = True
+    if self._tallest_shrank:
+      self._tallest_shrank = False
+      max_height = int(self._snow_heights.max())
+      if max_height != self._max_height:
+        self._max_height = max_height
+        self._bounds_stale = True
+    if self._bounds_stale:
+      self._bounds_stale = False
+      self._update_bounding_rect()
+
+  def _update_bounding_rect(self):
+    # Make the bounding rect big enough to catch some snowflakes.
+    height = max(self._max_height, FALL_SPEED * 2)
     top_left = self._bottom_left_pos - (0, height)
-    return pygame.Rect(top_left.x, top_left.y, WIDTH_PER_COLUMN *
-                       len(self._snow_heights), height)
-
-  def _maybe_estimate_height(self):
-    if time.time() < self._next_bounds_update:
-      return
-
-    self._estimated_height = sum(
-        self._snow_heights) / len(self._snow_heights)
-    self._next_bounds_update = time.time() + 5
+    self._bounding_rect.update(top_left.x, top_left.y,
+                               WIDTH_PER_COLUMN * len(self._snow_heights),
+                               height)
+    self.bounds_version += 1
 
   @property
   def bounding_rect(self):
-    return self._make_rect(self._estimated_height, self._bottom_left_pos.x, self._bottom_left_pos.y)
+    """The pile's bounds; a shared Rect, so copy it before changing it."""
+    return self._bounding_rect
 
   @property
   def has_custom_collision(self):
@@ -294,21 +559,46 @@ class Snowpile(world.Thing):
     pass
 
   def draw(self, screen, viewpoint_pos):
+    surface = self._rendered_surface()
+    # The surface's bottom row is the pile's bottom edge.
     start = self._bottom_left_pos - viewpoint_pos
-    end = pygame.math.Vector2(
-        start.x + WIDTH_PER_COLUMN * len(self._snow_heights), start.y)
-
-    def point_for_column(i, height):
-      x = start.x + i * WIDTH_PER_COLUMN
-      y = start.y - height
-      return (x, y)
-
-    midpoints = [point_for_column(i, height)
-                 for i, height in enumerate(self._snow_heights)]
-    pointlist = [start] + midpoints + [end]
-    pygame.draw.polygon(screen, WHITE, pointlist)
+    screen.blit(surface, (start.x, start.y - surface.get_height() + 1))
 
     if self._draw_bounding_box:
       draw_rect = pygame.Rect(self.bounding_rect)
       draw_rect.topleft = draw_rect.topleft - viewpoint_pos
       pygame.draw.rect(screen, pygame.Color(255, 0, 0), draw_rect, 1)
+
+  def mark_dirty(self, region, viewpoint_pos):
+    region.add_rect(self._bounding_rect.move(-viewpoint_pos))
+
+  def snapshot(self):
+    # Render here, so whoever draws the copy doesn't have to.
+    self._rendered_surface()
+    frozen = copy.copy(self)
+    frozen._snow_heights = self._snow_heights.copy()
+    frozen._bottom_left_pos = pygame.math.Vector2(self._bottom_left_pos)
+    frozen._bounding_rect = pygame.Rect(self._bounding_rect)
+    return frozen
+
+  def _rendered_surface(self):
+    if self._surface_dirty:
+      self._surface = self._render()
+      self._surface_dirty = False
+    return self._surface
+
+  def _render(self):
+    heights = self._snow_heights.tolist()
+    width = WIDTH_PER_COLUMN * len(heights)
+    bottom = max(heights)
+    surface = pygame.Surface((width + 1, bottom + 1))
+    surface.set_colorkey(TRANSPARENT)
+    surface.fill(TRANSPARENT)
+
+    start = (0, bottom)
+    end = (width, bottom)
+    midpoints = [(i * WIDTH_PER_COLUMN, bottom - height)
+                 for i, height in enumerate(heights)]
+    pointlist = [start] + midpoints + [end]
+    pygame.draw.polygon(surface, WHITE, pointlist)
+    return surface
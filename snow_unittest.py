@@ -12,13 +12,285 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pygame
+import random
 import unittest
 
+import kdtree
+import obstacles
 import snow
+import winds
+
+
+def make_obstacles():
+  color = pygame.Color(255, 255, 255)
+  boxes = [obstacles.Box(pygame.Rect(100, 100, 40, 40), color),
+           obstacles.Box(pygame.Rect(300, 200, 20, 20), color)]
+  return kdtree.obstacle_kd_tree(boxes)
+
+
+def make_snowfall(vectorized, positions):
+  snowfall = snow.Snowfall()
+  snowfall.vectorized = vectorized
+  for x, y in positions:
+    snowfall.snowflakes.append(x, y)
+  return snowfall
 
 
 class SnowTest(unittest.TestCase):
-  pass
+
+  def test_vectorized_step_moves_all_flakes(self):
+    snowfall = make_snowfall(vectorized=True,
+                             positions=[(0, 0), (1000, 1000), (5.5, 7)])
+    speed = snow.Snowfall.speed
+
+    snowfall.move_snow(make_obstacles(), winds.NullWind())
+
+    expected = [(0 + speed.x, 0 + speed.y),
+                (1000 + speed.x, 1000 + speed.y),
+                (5.5 + speed.x, 7 + speed.y)]
+    result = list(snowfall.snowflakes.all_positions)
+    for (x, y), (expected_x, expected_y) in zip(result, expected):
+      self.assertAlmostEqual(x, expected_x, places=4)
+      self.assertAlmostEqual(y, expected_y, places=4)
+
+  def test_vectorized_step_lands_same_flakes_as_per_flake_step(self):
+    positions = [(120, 110), (0, 0), (310, 205), (500, 500), (130, 95)]
+    random.seed(0)
+    per_flake = make_snowfall(vectorized=False, positions=positions)
+    per_flake.move_snow(make_obstacles(), winds.NullWind())
+    random.seed(0)
+    vectorized = make_snowfall(vectorized=True, positions=positions)
+    vectorized.move_snow(make_obstacles(), winds.NullWind())
+
+    self.assertEqual(sorted(vectorized.snowflakes.all_positions),
+                     sorted(per_flake.snowflakes.all_positions))
+    self.assertEqual(vectorized.snowflakes.num_positions(), 2)
+
+  def test_spawning_adds_spawn_rate_flakes_at_the_top(self):
+    snowfall = snow.Snowfall()
+    snowfall.spawn_rate = 10
+
+    snowfall.spawn_snowflakes()
+
+    result = list(snowfall.snowflakes.all_positions)
+    self.assertEqual(len(result), 10)
+    self.assertTrue(all(y == 0 for _, y in result))
+
+  def test_bulk_draw_matches_per_flake_draw(self):
+    positions = [(10, 10), (-0.5, 3), (99.9, 50), (100, 50), (-3, -3),
+                 (150, 40), (42.7, 99.2), (1e6, 1e6)]
+    viewpoint_pos = pygame.math.Vector2(20.25, -5.5)
+    screens = []
+    for bulk_draw in (True, False):
+      snowfall = make_snowfall(vectorized=True, positions=positions)
+      snowfall.bulk_draw = bulk_draw
+      screen = pygame.Surface((100, 100))
+      screen.set_clip(pygame.Rect(0, 0, 90, 100))
+      snowfall.draw(screen, viewpoint_pos)
+      screens.append(pygame.image.tostring(screen, 'RGB'))
+
+    self.assertEqual(screens[0], screens[1])
+    self.assertIn(b'\xff', screens[0])
+
+  def test_full_pool_drops_oldest_flakes(self):
+    snowfall = make_snowfall(vectorized=True,
+                             positions=[(1, 1), (2, 2), (3, 3)])
+    snowfall.max_flakes = 4
+
+    snowfall.spawn_snowball(pygame.math.Vector2(100, 100))
+
+    result = list(snowfall.snowflakes.all_positions)
+    self.assertEqual(len(result), 4)
+    self.assertNotIn((1, 1), result)
+    self.assertEqual(snowfall.dropped_flakes, 1600 + 3 - 4)
+
+  def test_full_pool_drops_oldest_flakes_in_both_step_modes(self):
+    for vectorized in (True, False):
+      # Oldest first; the flake at (120, 110) lands on a box.
+      snowfall = make_snowfall(
+          vectorized=vectorized,
+          positions=[(120, 110), (1000, 2), (1000, 3), (1000, 4), (1000, 5)])
+      snowfall.max_flakes = 5
+      snowfall.move_snow(make_obstacles(), winds.NullWind())
+      snowfall.spawn_rate = 2
+
+      snowfall.spawn_snowflakes()
+
+      # Landing must not reorder the pool: the oldest flake left goes first.
+      # New flakes spawn at y = 0, the old ones have moved down a bit.
+      old_ys = sorted(round(y - snow.Snowfall.speed.y)
+                      for _, y in snowfall.snowflakes.all_positions if y)
+      self.assertEqual(old_ys, [3, 4, 5])
+      self.assertEqual(snowfall.dropped_flakes, 1)
+
+  def test_full_pool_can_refuse_to_spawn(self):
+    snowfall = make_snowfall(vectorized=True,
+                             positions=[(1, 1), (2, 2), (3, 3)])
+    snowfall.max_flakes = 4
+    snowfall.overflow_policy = snow.REFUSE_SPAWN
+
+    snowfall.spawn_snowball(pygame.math.Vector2(100, 100))
+
+    result = list(snowfall.snowflakes.all_positions)
+    self.assertEqual(result[:3], [(1, 1), (2, 2), (3, 3)])
+    self.assertEqual(len(result), 4)
+    self.assertEqual(snowfall.dropped_flakes, 1600 - 1)
+
+  def test_flakes_leaving_world_bounds_are_killed(self):
+    for vectorized in (True, False):
+      snowfall = make_snowfall(vectorized=vectorized,
+                               positions=[(2, 500), (50, 500), (50, 995)])
+      snowfall.world_bounds = pygame.Rect(0, 0, 1000, 1000)
+      no_obstacles = kdtree.obstacle_kd_tree([])
+
+      snowfall.move_snow(no_obstacles, winds.StaticWind(
+          windspeed=pygame.math.Vector2(-10, 0)))
+
+      self.assertEqual(snowfall.snowflakes.num_positions(), 1)
+      self.assertEqual(snowfall.killed_flakes, 2)
+
+  def test_adding_many_flakes_bins_them_into_columns(self):
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(100, 200))
+
+    drift_snow = pile.add_many(xs=[110, 111.5, 114], ys=[199, 199, 199])
+
+    self.assertEqual(len(drift_snow), 0)
+    self.assertEqual(pile._snow_heights.tolist(), [0, 0, 0, 0, 0, 2, 0, 1, 0, 0])
+
+  def test_adding_many_flakes_conserves_snow(self):
+    random.seed(0)
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(100, 200))
+    xs = [random.uniform(90, 130) for _ in range(500)]
+    ys = [random.uniform(190, 205) for _ in range(500)]
+
+    drift_snow = pile.add_many(xs, ys)
+
+    self.assertEqual(sum(pile._snow_heights) + len(drift_snow), 500)
+    self.assertTrue(all(height >= 0 for height in pile._snow_heights))
+
+  def test_snowpile_draws_same_polygon_as_before_caching(self):
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(30, 60))
+    pile._draw_bounding_box = False
+    pile.add_many(xs=[31, 33, 33, 37, 45, 47], ys=[59] * 6)
+    viewpoint_pos = pygame.math.Vector2(10, 5)
+
+    screen = pygame.Surface((100, 100))
+    pile.draw(screen, viewpoint_pos)
+
+    reference = pygame.Surface((100, 100))
+    start = pygame.math.Vector2(20, 55)
+    heights = pile._snow_heights.tolist()
+    pointlist = ([start] +
+                 [(start.x + i * snow.WIDTH_PER_COLUMN, start.y - height)
+                  for i, height in enumerate(heights)] +
+                 [(start.x + snow.WIDTH_PER_COLUMN * len(heights), start.y)])
+    pygame.draw.polygon(reference, snow.WHITE, pointlist)
+    self.assertEqual(pygame.image.tostring(screen, 'RGB'),
+                     pygame.image.tostring(reference, 'RGB'))
+
+  def test_snowpile_only_rerenders_after_changes(self):
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(30, 60))
+    screen = pygame.Surface((100, 100))
+
+    pile.draw(screen, pygame.math.Vector2(0, 0))
+    first_surface = pile._surface
+    pile.draw(screen, pygame.math.Vector2(5, 5))
+    self.assertIs(pile._surface, first_surface)
+
+    pile.add_many(xs=[31], ys=[59])
+    pile.draw(screen, pygame.math.Vector2(5, 5))
+    self.assertIsNot(pile._surface, first_surface)
+
+  def test_snowpile_keeps_its_surface_when_wind_moves_no_snow(self):
+    random.seed(0)
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(30, 60))
+    screen = pygame.Surface((100, 100))
+    pile.draw(screen, pygame.math.Vector2(0, 0))
+    first_surface = pile._surface
+
+    for windspeed in ((-1, 0), (-winds.MAX_POSSIBLE_MAGNITUDE, 0)):
+      wind = winds.StaticWind(pygame.math.Vector2(windspeed))
+      for _ in range(10):
+        pile.drift_from_wind(wind)
+        pile.draw(screen, pygame.math.Vector2(0, 0))
+
+    self.assertIs(pile._surface, first_surface)
+
+  def test_snowpile_bounds_follow_highest_column(self):
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(30, 60))
+    bounds = pile.bounding_rect
+    self.assertEqual(bounds, pygame.Rect(30, 60 - snow.FALL_SPEED * 2, 20,
+                                         snow.FALL_SPEED * 2))
+
+    pile.add_many(xs=[35] * 2 + [45] * 2, ys=[59] * 4)
+    pile.add_many(xs=[35] * 2 + [45] * 2, ys=[59] * 4)
+    heights = pile._snow_heights
+    pile.add_many(xs=[39] * 30, ys=[59] * 30)
+    pile.add_many(xs=[45], ys=[59])
+
+    self.assertIs(pile.bounding_rect, bounds)
+    self.assertEqual(bounds.height, max(heights))
+    self.assertEqual(bounds.bottom, 60)
+
+  def test_snowpile_bounds_stay_exact_as_snow_lands_and_drifts(self):
+    random.seed(0)
+    pile = snow.Snowpile(num_columns=20,
+                         bottom_left_pos=pygame.math.Vector2(0, 100))
+    gust = winds.StaticWind(pygame.math.Vector2(-winds.MAX_POSSIBLE_MAGNITUDE,
+                                                0))
+    for _ in range(200):
+      xs = [random.uniform(0, 40) for _ in range(random.randint(0, 10))]
+      pile.add_many(xs=xs, ys=[99] * len(xs))
+      pile.add(pygame.math.Vector2(random.uniform(0, 40), 99))
+      pile.drift_from_wind(gust)
+
+      self.assertEqual(pile._max_height, pile._snow_heights.max())
+      self.assertEqual(pile.bounding_rect.height,
+                       max(pile._snow_heights.max(), snow.FALL_SPEED * 2))
+
+  def test_snowpile_bounds_follow_moves(self):
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(30, 60))
+    version = pile.bounds_version
+
+    pile.move(pygame.math.Vector2(100, 200))
+
+    self.assertEqual(pile.bounding_rect.bottomleft, (100, 200))
+    self.assertNotEqual(pile.bounds_version, version)
+
+  def test_snow_bleeding_off_pile_comes_back_as_positions(self):
+    random.seed(0)
+    pile = snow.Snowpile(num_columns=10,
+                         bottom_left_pos=pygame.math.Vector2(30, 60))
+
+    drift_snow = pile.add_many(xs=[30.5] * 10, ys=[59] * 10)
+
+    self.assertEqual(drift_snow.shape, (7, 2))
+    self.assertTrue(all(x == 30 - 5 for x in drift_snow[:, 0]))
+    self.assertEqual(pile._snow_heights[0], 3)
+
+  def test_snowfall_snapshot_keeps_the_flakes_it_had(self):
+    positions = [(10, 10), (42.7, 99.2), (50, 60)]
+    snowfall = make_snowfall(vectorized=True, positions=positions)
+
+    for bulk_draw in (True, False):
+      snowfall.bulk_draw = bulk_draw
+      frozen = snowfall.snapshot()
+      expected = pygame.Surface((100, 100))
+      snowfall.draw(expected, pygame.math.Vector2(0, 0))
+      snowfall.move_snow(make_obstacles(), winds.NullWind())
+
+      screen = pygame.Surface((100, 100))
+      frozen.draw(screen, pygame.math.Vector2(0, 0))
+      self.assertEqual(pygame.image.tostring(screen, 'RGB'),
+                       pygame.image.tostring(expected, 'RGB'))
 
 
 if __name__ == '__main__':
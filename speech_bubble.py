@@ -15,14 +15,16 @@
 
 import pygame
 import pygame.freetype
-import time
+
+import clocks
 
 
 class SpeechBubble(object):
 
-  def __init__(self, what_to_say, duration):
+  def __init__(self, what_to_say, duration, world_clock=None):
     self._what_to_say = what_to_say
-    self._end_time = time.time() + duration
+    self._world_clock = world_clock or clocks.WallClock()
+    self._end_time = self._world_clock.now() + duration
     self._font = pygame.freetype.SysFont('Comic Sans', 10)
 
   def draw(self, screen, x, y, player_head_radius):
@@ -45,8 +47,18 @@ class SpeechBubble(object):
     circle_left_edge = (center.x - text_bounds.width / 2, center.y)
     self._font.render_to(screen, circle_left_edge, self._what_to_say)
 
+  def bounds(self, x, y, player_head_radius):
+    """Returns the rect draw() draws into, given the same arguments."""
+    text_width = self._font.get_rect(self._what_to_say).width
+    radius = int(text_width / 2) + 5
+    circle = pygame.Rect(0, 0, radius * 2 + 1, radius * 2 + 1)
+    circle.center = (x + text_width / 2, y - text_width / 2)
+    # The tip of the speech arrow is off to the left of the circle.
+    return circle.union(pygame.Rect(x, y - player_head_radius,
+                                    player_head_radius + 6, 1))
+
   def done(self):
-    return time.time() > self._end_time
+    return self._world_clock.now() > self._end_time
 
 
 class NullSpeechBubble(object):
@@ -54,5 +66,8 @@ class NullSpeechBubble(object):
   def draw(self, screen, x, y, player_head_radius):
     pass
 
+  def bounds(self, x, y, player_head_radius):
+    return None
+
   def done(self):
     return False
@@ -0,0 +1,82 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+
+class SimulationThread(object):
+  """Advances a Simulation on a thread of its own.
+
+  After every tick the thread publishes a snapshot of the world, and the
+  render loop draws the latest one, so a slow tick doesn't hold up drawing
+  (numpy and pygame let go of the GIL while they work). Anything else that
+  touches the simulation, like handling input, must hold lock.
+
+  with SimulationThread(game) as thread:
+    snapshot, alpha = thread.latest()
+    game.draw_snapshot(snapshot, alpha)"""
+
+  def __init__(self, game):
+    self.game = game
+    self.lock = threading.Lock()
+    self._latest = (game.snapshot(), time.perf_counter())
+    self._stopping = threading.Event()
+    self._error = None
+    self._thread = threading.Thread(target=self._run, name='simulation',
+                                    daemon=True)
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.stop()
+
+  def start(self):
+    self._thread.start()
+
+  def stop(self):
+    self._stopping.set()
+    self._thread.join()
+
+  def latest(self):
+    """Returns the newest snapshot and the alpha to draw it with.
+
+    alpha is how far we are from that tick to the next one. Raises what
+    the simulation raised if it crashed."""
+    if self._error:
+      raise self._error
+    snapshot, published = self._latest
+    timestep = self.game.timestep
+    alpha = (time.perf_counter() - published) / timestep.seconds_per_tick
+    return snapshot, min(alpha, 1.0)
+
+  def _run(self):
+    timestep = self.game.timestep
+    last = time.perf_counter()
+    try:
+      while not self._stopping.is_set():
+        now = time.perf_counter()
+        ticks = timestep.ticks_for_frame(now - last)
+        last = now
+        for _ in range(ticks):
+          with self.lock:
+            self.game.advance()
+            snapshot = self.game.snapshot()
+          self._latest = (snapshot, time.perf_counter())
+        # Sleep until the next tick is due.
+        self._stopping.wait((1.0 - timestep.alpha) * timestep.seconds_per_tick)
+    except Exception as e:
+      self._error = e
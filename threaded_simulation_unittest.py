@@ -0,0 +1,84 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pygame
+import pygame.freetype
+import time
+import unittest
+
+import clocks
+import headless
+import simulation
+import threaded_simulation
+
+
+def make_game():
+  headless.init_headless()
+  pygame.freetype.init()
+  screen = pygame.display.set_mode((640, 480))
+  return simulation.Simulation(screen, pygame.math.Vector2(640, 480),
+                               clock=None, world_clock=clocks.SimulatedClock())
+
+
+def wait_for(condition, timeout=5.0):
+  deadline = time.perf_counter() + timeout
+  while not condition() and time.perf_counter() < deadline:
+    time.sleep(0.01)
+  return condition()
+
+
+class SimulationThreadTest(unittest.TestCase):
+
+  def test_publishes_snapshots_as_it_advances(self):
+    game = make_game()
+    first_clock = game.world_clock.now()
+
+    with threaded_simulation.SimulationThread(game) as thread:
+      first, _ = thread.latest()
+      self.assertTrue(wait_for(lambda: thread.latest()[0] is not first))
+      snapshot, alpha = thread.latest()
+      game.draw_snapshot(snapshot, alpha)
+
+    self.assertGreater(game.world_clock.now(), first_clock)
+    self.assertGreaterEqual(alpha, 0.0)
+    self.assertLessEqual(alpha, 1.0)
+
+  def test_snapshot_does_not_change_with_the_world(self):
+    game = make_game()
+    snapshot = game.snapshot()
+    player_pos = pygame.math.Vector2(snapshot.player_pos)
+    num_flakes = len(snapshot.snowfall._positions)
+
+    for _ in range(10):
+      game.advance()
+
+    self.assertEqual(snapshot.player_pos, player_pos)
+    self.assertEqual(snapshot.player.at, player_pos)
+    self.assertEqual(len(snapshot.snowfall._positions), num_flakes)
+    self.assertNotEqual(game.snowfall.snowflakes.num_positions(), num_flakes)
+
+  def test_latest_raises_what_the_simulation_raised(self):
+    game = make_game()
+
+    def broken_advance():
+      raise ValueError('broken')
+    game.advance = broken_advance
+
+    with threaded_simulation.SimulationThread(game) as thread:
+      with self.assertRaisesRegex(ValueError, 'broken'):
+        wait_for(lambda: thread.latest() and False)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,160 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import math
+import time
+
+
+# How many samples each phase keeps; 10 seconds' worth at 30 fps.
+HISTORY = 300
+PERCENTILES = (50, 95, 99)
+
+
+class RollingHistogram(object):
+  """Keeps the last few samples of something and their percentiles."""
+
+  def __init__(self, size=HISTORY):
+    self._samples = collections.deque(maxlen=size)
+
+  def add(self, value):
+    self._samples.append(value)
+
+  @property
+  def samples(self):
+    return list(self._samples)
+
+  def percentiles(self, percentiles=PERCENTILES):
+    """Returns the nearest-rank percentiles of the samples, or zeros."""
+    ordered = sorted(self._samples)
+    if not ordered:
+      return tuple(0.0 for _ in percentiles)
+    return tuple(ordered[max(math.ceil(p / 100 * len(ordered)), 1) - 1]
+                 for p in percentiles)
+
+
+class _PhaseTimer(object):
+  __slots__ = ('_histogram', '_start')
+
+  def __init__(self, histogram):
+    self._histogram = histogram
+    self._start = 0.0
+
+  def __enter__(self):
+    self._start = time.perf_counter()
+
+  def __exit__(self, *exc_info):
+    self._histogram.add((time.perf_counter() - self._start) * 1000)
+
+
+class _TracedPhaseTimer(object):
+  __slots__ = ('_phase', '_histogram', '_tracer', '_start')
+
+  def __init__(self, phase, histogram, tracer):
+    self._phase = phase
+    # None if only tracing.
+    self._histogram = histogram
+    self._tracer = tracer
+    self._start = 0.0
+
+  def __enter__(self):
+    self._start = time.perf_counter()
+
+  def __exit__(self, *exc_info):
+    end = time.perf_counter()
+    if self._histogram is not None:
+      self._histogram.add((end - self._start) * 1000)
+    self._tracer.add_span(self._phase, self._start, end)
+
+
+class _NullTimer(object):
+  __slots__ = ()
+
+  def __enter__(self):
+    pass
+
+  def __exit__(self, *exc_info):
+    pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class PhaseTimers(object):
+  """Times named phases of a frame, in milliseconds.
+
+  with timers.time('wind'):
+    wind.update()
+
+  When disabled (and not tracing), time() hands out a timer that does
+  nothing, so leaving the with statements in costs next to nothing."""
+
+  def __init__(self, enabled=True, history=HISTORY, tracer=None):
+    self._enabled = enabled
+    self._tracer = tracer
+    self._history = history
+    self._timers = {}
+    self._histograms = collections.OrderedDict()
+
+  @property
+  def enabled(self):
+    return self._enabled
+
+  @enabled.setter
+  def enabled(self, enabled):
+    self._enabled = enabled
+    self._timers.clear()
+
+  @property
+  def tracer(self):
+    """A tracing.Tracer that also gets a span for every timed phase."""
+    return self._tracer
+
+  @tracer.setter
+  def tracer(self, tracer):
+    self._tracer = tracer
+    self._timers.clear()
+
+  def time(self, phase):
+    timer = self._timers.get(phase)
+    if timer is None:
+      timer = self._timers[phase] = self._make_timer(phase)
+    return timer
+
+  def _make_timer(self, phase):
+    histogram = None
+    if self._enabled:
+      histogram = self._histograms.get(phase)
+      if histogram is None:
+        histogram = self._histograms[phase] = RollingHistogram(self._history)
+    if self._tracer:
+      return _TracedPhaseTimer(phase, histogram, self._tracer)
+    if histogram is not None:
+      return _PhaseTimer(histogram)
+    return _NULL_TIMER
+
+  def histogram(self, phase):
+    """Returns the phase's histogram; it's empty if it was never timed."""
+    return self._histograms.get(phase) or RollingHistogram(self._history)
+
+  def summary(self):
+    """Returns (p50, p95, p99) per phase, in the order phases first ran."""
+    # Copy the items first; another thread may be timing a new phase.
+    return collections.OrderedDict(
+        (phase, histogram.percentiles())
+        for phase, histogram in list(self._histograms.items()))
+
+
+# For things that can be timed but usually aren't.
+DISABLED = PhaseTimers(enabled=False)
@@ -0,0 +1,65 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import timing
+
+
+class RollingHistogramTest(unittest.TestCase):
+
+  def test_percentiles(self):
+    histogram = timing.RollingHistogram()
+    for value in range(1, 101):
+      histogram.add(value)
+
+    self.assertEqual((50, 95, 99), histogram.percentiles())
+
+  def test_only_keeps_latest_samples(self):
+    histogram = timing.RollingHistogram(size=3)
+    for value in (100, 1, 2, 3):
+      histogram.add(value)
+
+    self.assertEqual([1, 2, 3], histogram.samples)
+    self.assertEqual((3,), histogram.percentiles((100,)))
+
+  def test_empty(self):
+    self.assertEqual((0.0, 0.0, 0.0), timing.RollingHistogram().percentiles())
+
+
+class PhaseTimersTest(unittest.TestCase):
+
+  def test_times_phases_in_order(self):
+    timers = timing.PhaseTimers()
+    for _ in range(3):
+      with timers.time('b'):
+        pass
+      with timers.time('a'):
+        pass
+
+    self.assertEqual(['b', 'a'], list(timers.summary()))
+    self.assertEqual(3, len(timers.histogram('a').samples))
+    self.assertGreaterEqual(min(timers.histogram('a').samples), 0)
+
+  def test_disabled_timers_record_nothing(self):
+    timers = timing.PhaseTimers(enabled=False)
+    with timers.time('a'):
+      pass
+
+    self.assertEqual({}, timers.summary())
+    self.assertEqual([], timers.histogram('a').samples)
+
+
+if __name__ == '__main__':
+  unittest.main()
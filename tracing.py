@@ -0,0 +1,84 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+
+
+# Spans kept in memory; older ones are forgotten. At ~20 spans per frame
+# this is well over a minute of play.
+RING_SIZE = 100000
+
+
+class _Span(object):
+  __slots__ = ('_tracer', '_name', '_start')
+
+  def __init__(self, tracer, name):
+    self._tracer = tracer
+    self._name = name
+    self._start = 0.0
+
+  def __enter__(self):
+    self._start = time.perf_counter()
+
+  def __exit__(self, *exc_info):
+    self._tracer.add_span(self._name, self._start, time.perf_counter())
+
+
+class Tracer(object):
+  """Records spans of time into a ring and writes them as a Chrome trace.
+
+  Open the written file in chrome://tracing or https://ui.perfetto.dev.
+  Usually fed through timing.PhaseTimers.tracer, but other code can record
+  spans directly:
+
+  with tracer.span('load level'):
+    ...
+  """
+
+  def __init__(self, path, ring_size=RING_SIZE, flush_at_exit=True):
+    self.path = path
+    self._spans = collections.deque(maxlen=ring_size)
+    if flush_at_exit:
+      atexit.register(self.flush)
+
+  def span(self, name):
+    return _Span(self, name)
+
+  def add_span(self, name, start, end):
+    """Records a span; start and end come from time.perf_counter()."""
+    self._spans.append((name, start, end, threading.get_ident()))
+
+  def trace_events(self):
+    pid = os.getpid()
+    # Spans are recorded as they end, so inner spans come before the spans
+    # around them. Viewers cope, but sort by start time anyway.
+    return [{'name': name, 'ph': 'X', 'ts': start * 1e6,
+             'dur': (end - start) * 1e6, 'pid': pid, 'tid': tid}
+            for name, start, end, tid in sorted(self._spans,
+                                                key=lambda s: s[1])]
+
+  def flush(self, path=None):
+    """Writes the spans in the ring to path (or self.path); returns the path.
+
+    The ring is kept, so later flushes include these spans too."""
+    path = path or self.path
+    with open(path, 'w') as f:
+      json.dump({'traceEvents': self.trace_events(),
+                 'displayTimeUnit': 'ms'}, f)
+    return path
@@ -0,0 +1,74 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import unittest
+
+import timing
+import tracing
+
+
+class TracerTest(unittest.TestCase):
+
+  def setUp(self):
+    handle, self.path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    self.addCleanup(os.remove, self.path)
+
+  def read_trace(self):
+    with open(self.path) as f:
+      return json.load(f)['traceEvents']
+
+  def test_writes_nested_spans(self):
+    tracer = tracing.Tracer(self.path, flush_at_exit=False)
+    with tracer.span('outer'):
+      with tracer.span('inner'):
+        pass
+
+    tracer.flush()
+
+    outer, inner = self.read_trace()
+    self.assertEqual(('outer', 'inner'), (outer['name'], inner['name']))
+    self.assertEqual('X', outer['ph'])
+    self.assertLessEqual(outer['ts'], inner['ts'])
+    self.assertGreaterEqual(outer['ts'] + outer['dur'],
+                            inner['ts'] + inner['dur'])
+
+  def test_only_keeps_latest_spans(self):
+    tracer = tracing.Tracer(self.path, ring_size=2, flush_at_exit=False)
+    for name in ('a', 'b', 'c'):
+      with tracer.span(name):
+        pass
+
+    tracer.flush()
+
+    self.assertEqual(['b', 'c'], [e['name'] for e in self.read_trace()])
+
+  def test_phase_timers_feed_tracer(self):
+    tracer = tracing.Tracer(self.path, flush_at_exit=False)
+    timers = timing.PhaseTimers(enabled=False)
+    timers.tracer = tracer
+
+    with timers.time('wind'):
+      pass
+
+    tracer.flush()
+    self.assertEqual(['wind'], [e['name'] for e in self.read_trace()])
+    self.assertEqual({}, timers.summary())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import pygame
 import random
 
@@ -36,6 +37,15 @@ class Trampoline(world.Thing):
         self._rect.topleft) - (half_length, -half_length) - viewpoint_pos
     pygame.draw.line(screen, self._color, point_1, point_2)
 
+  def mark_dirty(self, region, viewpoint_pos):
+    # Trampolines never change.
+    pass
+
+  def snapshot(self):
+    frozen = copy.copy(self)
+    frozen._rect = pygame.Rect(self._rect)
+    return frozen
+
   @property
   def bounding_rect(self):
     return self._rect
@@ -14,8 +14,8 @@
 
 import pygame
 import random
-import time
 
+import clocks
 import resources
 
 
@@ -34,18 +34,24 @@ class Wind(object):
 
 class Gust(Wind):
 
-  def __init__(self, direction: pygame.math.Vector2):
+  def __init__(self, direction: pygame.math.Vector2, world_clock=None):
     super().__init__(direction)
     self._initial_windspeed = direction.normalize()
-    self._next_change_allowed_at = time.time()
-    self._weak_wind_sound = pygame.mixer.Sound(
-        resources.sound_path('weak_wind.wav'))
-    self._strong_wind_sound = pygame.mixer.Sound(
-        resources.sound_path('wind.wav'))
+    self._world_clock = world_clock or clocks.WallClock()
+    self._next_change_allowed_at = self._world_clock.now()
+    if pygame.mixer.get_init():
+      self._weak_wind_sound = pygame.mixer.Sound(
+          resources.sound_path('weak_wind.wav'))
+      self._strong_wind_sound = pygame.mixer.Sound(
+          resources.sound_path('wind.wav'))
+    else:
+      # No audio (e.g. when running headless); blow silently.
+      self._weak_wind_sound = self._strong_wind_sound = None
+      self.emit_sounds = False
     self._current_sound = self._weak_wind_sound
 
   def update(self):
-    if time.time() < self._next_change_allowed_at:
+    if self._world_clock.now() < self._next_change_allowed_at:
       return
 
     random_factor = random.randint(0, MAX_POSSIBLE_MAGNITUDE / 5)
@@ -58,10 +64,11 @@ class Gust(Wind):
     self._rate_limit(max_changes_per_second=0.5)
 
   def _rate_limit(self, max_changes_per_second):
-    self._next_change_allowed_at = time.time() + 1.0 / max_changes_per_second
+    self._next_change_allowed_at = (self._world_clock.now() +
+                                    1.0 / max_changes_per_second)
 
   def _maybe_emit_sound(self, sound):
-    if not self.emit_sounds:
+    if not self.emit_sounds or not sound:
       return
     if self._current_sound == sound:
       return  # Already playing
@@ -18,6 +18,19 @@ class Drawable(object):
   def draw(self, screen, viewpoint_pos):
     raise NotImplementedError('draw')
 
+  def mark_dirty(self, region, viewpoint_pos):
+    """Marks where on screen drawing this can differ from frame to frame.
+
+    region is a dirty_rects.DirtyRegion. Anything that never changes can
+    mark nothing; by default, the whole screen is marked."""
+    region.mark_all()
+
+  def snapshot(self):
+    """Returns a copy that draws like this does now and never changes.
+
+    Lets one thread draw the world while another one changes it."""
+    raise NotImplementedError('snapshot')
+
 
 class Thing(Drawable):
   """Something that can be drawn in the game world, and collided with."""
@@ -32,3 +45,12 @@ class Thing(Drawable):
 
   def apply_custom_collision(self, player, current_speed):
     pass
+
+  @property
+  def is_kinematic(self):
+    """True for things that move by themselves; see update()."""
+    return False
+
+  def update(self):
+    """Called every tick for kinematic things, so they can move."""
+    pass
@@ -13,7 +13,8 @@
 # limitations under the License.
 
 import pygame
-import time
+
+import clocks
 
 
 def _to_world_coords(click_pos, viewpoint_pos):
@@ -22,12 +23,13 @@ def _to_world_coords(click_pos, viewpoint_pos):
 
 class WeatherControl(object):
 
-  def __init__(self, world_snowfall):
+  def __init__(self, world_snowfall, world_clock=None):
     self._snowfall = world_snowfall
-    self._next_change_allowed_at = time.time()
+    self._world_clock = world_clock or clocks.WallClock()
+    self._next_change_allowed_at = self._world_clock.now()
 
   def act_on_input(self, pygame_event, viewpoint_pos):
-    if time.time() < self._next_change_allowed_at:
+    if self._world_clock.now() < self._next_change_allowed_at:
       return
 
     pressed = pygame.key.get_pressed()
@@ -44,7 +46,8 @@ class WeatherControl(object):
       self._rate_limit(max_changes_per_second=2)
 
   def _rate_limit(self, max_changes_per_second):
-    self._next_change_allowed_at = time.time() + 1.0 / max_changes_per_second
+    self._next_change_allowed_at = (self._world_clock.now() +
+                                    1.0 / max_changes_per_second)
 
 
 class WorldEditor(object):
@@ -71,7 +74,6 @@ class WorldEditor(object):
     if pygame_event.type == pygame.MOUSEBUTTONUP and pygame_event.button == 1:
       self._dragged_obstacle = None
       self._pointer_offset = None
-      self._simulation.after_obstacle_moved()
       return True
 
     if pygame_event.type == pygame.MOUSEMOTION:
@@ -83,6 +85,7 @@ class WorldEditor(object):
         new_rect.x = new_pos.x
         new_rect.y = new_pos.y
         self._dragged_obstacle.move_or_resize(new_rect)
+        self._simulation.after_obstacle_moved(self._dragged_obstacle)
         return True
 
     return False